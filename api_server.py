@@ -96,9 +96,9 @@ def load_config_paths():
 load_config_paths()
 
 # Ensure data directories exist within the container
-os.makedirs(os.path.dirname(STATUS_FILE), exist_ok=True)
-os.makedirs(RECORDINGS_DIR, exist_ok=True)
-os.makedirs(os.path.dirname(CONFIG_JSON_FILE), exist_ok=True)
+for _dir in {os.path.dirname(STATUS_FILE), RECORDINGS_DIR, os.path.dirname(CONFIG_JSON_FILE)}:
+    os.makedirs(_dir, exist_ok=True)
+del _dir
 
 # Initialize DataStore after config is loaded
 data_store = DataStore(db_path=DB_PATH)
@@ -110,8 +110,10 @@ sdr_manager = SDRManager()
 # --- Utility Functions ---
 def update_status_file(status_data):
     try:
+        # Serialize before opening, so an error can't leave status.json truncated; then one write
+        payload = json.dumps(status_data, indent=4)
         with open(STATUS_FILE, 'w') as f:
-            json.dump(status_data, f, indent=4)
+            f.write(payload)
         logger.debug("Status file updated.")
     except Exception as e:
         logger.error(f"Error updating status file {STATUS_FILE}: {e}")
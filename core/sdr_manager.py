@@ -7,11 +7,12 @@ import time # For potential delays in error recovery
 import subprocess # For running rtl_test directly
 import re # Added: For regular expressions
 
-# Import RtlSdr directly. We will use it for opening/closing, but not for listing.
-from rtlsdr import RtlSdr 
-
 logger = logging.getLogger(__name__)
 
+# Serial number in a line of rtl_test's device list, e.g. "  0:  Realtek, RTL2838UHIDIR, SN: 00000001".
+# [ \t]* rather than \s* so a match never runs past the end of its line.
+_SERIAL_RE = re.compile(r"SN:[ \t]*([0-9a-fA-F]+)")
+
 class SDRManager:
     def __init__(self, device_identifier=0, sample_rate=2.048e6, center_freq=8.992e6, gain='auto', ppm_correction=0):
         self.sdr = None
@@ -34,15 +35,8 @@ class SDRManager:
         try:
             # Run rtl_test -t and capture its output
             result = subprocess.run(["rtl_test", "-t"], capture_output=True, text=True, check=False)
-            output_lines = result.stdout.splitlines() + result.stderr.splitlines()
-
-            for line in output_lines:
-                # Example line: "  0:  Realtek, RTL2838UHIDIR, SN: 00000001"
-                match = re.search(r"SN:\s*([0-9a-fA-F]+)", line)
-                if match:
-                    serial = match.group(1)
-                    if serial not in devices: # Avoid duplicates
-                        devices.append(serial)
+            # One findall over both streams; dict.fromkeys drops duplicates while keeping device order
+            devices = list(dict.fromkeys(_SERIAL_RE.findall(result.stdout + "\n" + result.stderr)))
             
             if not devices:
                 logger.critical("CRITICAL ERROR: 'rtl_test -t' ran, but no SDR devices with serial numbers were found in its output. "
@@ -63,7 +57,9 @@ class SDRManager:
             return
 
         try:
-            # Use RtlSdr from the imported rtlsdr module
+            # Imported here rather than at module level: pyrtlsdr loads librtlsdr through ctypes on import, and the
+            # API server imports this module only to list devices via rtl_test. We use RtlSdr for opening/closing, not listing.
+            from rtlsdr import RtlSdr
             if isinstance(self.device_identifier, str):
                 self.sdr = RtlSdr(serial_number=self.device_identifier)
             else:
@@ -5,6 +5,8 @@
 __version__ = "2.0.0"
 
 import os
+import re
+import argparse
 import time
 import logging
 import sys
@@ -12,14 +14,12 @@ import json
 import configparser
 import threading
 from datetime import datetime
+from functools import lru_cache
 import requests # For making requests to the internal Flask API (self-communication)
 
-# Import core modules
-# Assuming /app is the working directory inside the Docker container
-sys.path.append(os.path.join(os.path.dirname(__file__), 'core'))
-
-from sdr_manager import SDRManager
-from data_store import DataStore
+# Import core modules from the 'core' package next to this file (/app inside the Docker container)
+from core.sdr_manager import SDRManager
+from core.data_store import DataStore
 # No direct import of api_server.app here, as hfgcs.py will manage its lifecycle or interact via HTTP
 
 # --- Configuration Loading and Global Paths ---
@@ -54,11 +54,11 @@ except configparser.Error as e:
     CONFIG_JSON_FILE = '/app/data/hfgcspy_data/config.json'
 
 # Create necessary directories inside the Docker container
-os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
-os.makedirs(os.path.dirname(STATUS_FILE), exist_ok=True) 
-os.makedirs(RECORDINGS_DIR, exist_ok=True)
-os.makedirs(os.path.dirname(CONFIG_JSON_FILE), exist_ok=True)
+# A set, since several of these files share a directory
+for _dir in {os.path.dirname(DB_PATH), os.path.dirname(LOG_FILE), os.path.dirname(STATUS_FILE),
+             RECORDINGS_DIR, os.path.dirname(CONFIG_JSON_FILE)}:
+    os.makedirs(_dir, exist_ok=True)
+del _dir
 
 # --- Logging Setup ---
 logging.basicConfig(
@@ -74,8 +74,10 @@ logger.info(f"HFGCSpy application started. Version: {__version__}")
 
 # --- Global State for SDR Operations and Services ---
 sdr_threads = {} # Dict to hold SDRManager instances and their threads
-data_store = DataStore(DB_PATH) # Initialize DataStore globally
-data_store.initialize_db()
+data_store = DataStore(DB_PATH) # Initialize DataStore globally; tables are created by _bootstrap()
+
+# Characters not allowed in recording file names; compiled once rather than on every save
+_UNSAFE_FILENAME_CHARS_RE = re.compile(r'[^a-zA-Z0-9_.-]')
 
 # Service status flags (managed by polling config.ini)
 hfgcs_scan_enabled = False
@@ -85,6 +87,36 @@ adsb_scan_enabled = False # New service for ADS-B
 # SDR devices selected from config (list of serials or indices)
 selected_sdr_devices = []
 
+# _cfg_loaded_mtime that the last config.json export was built from; the export is skipped until it changes
+_cfg_export_mtime = 0
+
+# Scan frequencies per service, plus frozensets for O(1) membership checks in the decoder branches
+HFGCS_FREQS_HZ = (4724000, 6739000, 8992000, 11175000, 13200000, 15016000)
+JS8_FREQS_HZ = (7078000, 14078000) # Example JS8 frequencies
+ADSB_FREQS_HZ = (1090000000,) # ADS-B frequency (1090 MHz)
+HFGCS_FREQS_SET = frozenset(HFGCS_FREQS_HZ)
+JS8_FREQS_SET = frozenset(JS8_FREQS_HZ)
+ADSB_FREQS_SET = frozenset(ADSB_FREQS_HZ)
+
+# config.ini mtime at the last read by reload_config_if_changed(); None forces the first reload
+_cfg_loaded_mtime = None
+
+def reload_config_if_changed():
+    """
+    Re-reads config.ini into the shared `config` only when its mtime has changed since the last read.
+    Only main_app_loop calls this; the SDR threads use the scan flags it publishes.
+    """
+    global _cfg_loaded_mtime
+    try:
+        config_mtime = os.stat(CONFIG_FILE_PATH).st_mtime_ns
+    except OSError:
+        return False # No config.ini; keep the values already loaded
+    if config_mtime == _cfg_loaded_mtime:
+        return False
+    config.read(CONFIG_FILE_PATH)
+    _cfg_loaded_mtime = config_mtime
+    return True
+
 # --- Functions for Status and Config Export to JSON ---
 def update_web_status_file(detected_sdr_serials, selected_sdr_serials):
     """Writes the current service and SDR status to status.json for the web UI."""
@@ -102,8 +134,11 @@ def update_web_status_file(detected_sdr_serials, selected_sdr_serials):
         "last_updated": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     }
     try:
+        # json.dumps then a single write, instead of json.dump's write per chunk;
+        # a serialization error now fails before the file is truncated
+        payload = json.dumps(status_data, indent=4)
         with open(STATUS_FILE, 'w') as f:
-            json.dump(status_data, f, indent=4)
+            f.write(payload)
         logger.debug(f"Status written to {STATUS_FILE}")
     except IOError as e:
         logger.error(f"Failed to write status file {STATUS_FILE}: {e}")
@@ -114,16 +149,16 @@ def export_recent_messages_to_json(table_name='hfgcs_messages'):
         limit = config.getint('app', 'messages_per_page', fallback=50)
         messages = data_store.get_recent_messages(table_name=table_name, limit=limit)
         
+        # The timestamp columns are TEXT and the connection has no detect_types, so timestamps arrive as strings
+        # and go into the JSON unchanged; only missing ones are filled in, all with one 'now' string.
+        now_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         for msg in messages:
-            if 'timestamp' in msg and isinstance(msg['timestamp'], datetime):
-                msg['timestamp'] = msg['timestamp'].strftime("%Y-%m-%d %H:%M:%S")
-            elif 'timestamp' not in msg: # Ensure timestamp is always present
-                msg['timestamp'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            
+            msg.setdefault('timestamp', now_str) # Ensure timestamp is always present
             msg['table_name'] = table_name # Add table_name for UI delete action to know which table to target
 
+        payload = json.dumps(messages, indent=4)
         with open(MESSAGES_FILE, 'w') as f: # Currently writes all to one file, could be dynamic per table
-            json.dump(messages, f, indent=4)
+            f.write(payload)
         logger.debug(f"Exported {len(messages)} messages from {table_name} to {MESSAGES_FILE}")
     except IOError as e:
         logger.error(f"Failed to write messages file {MESSAGES_FILE}: {e}")
@@ -131,7 +166,17 @@ def export_recent_messages_to_json(table_name='hfgcs_messages'):
         logger.error(f"Error exporting messages from {table_name}: {e}", exc_info=True)
 
 def export_config_to_json():
-    """Exports a simplified version of config.ini to config.json for the web UI."""
+    """
+    Exports a simplified version of config.ini to config.json for the web UI.
+    The output only depends on the loaded config, so the export is skipped until reload_config_if_changed() re-reads it.
+    """
+    global _cfg_export_mtime
+    # The mtime of the config.ini that was actually parsed, not a fresh stat: an edit after the reload must not
+    # be recorded as exported before it has been read. None (nothing loaded) always exports the fallback values.
+    config_mtime = _cfg_loaded_mtime
+    if config_mtime is not None and config_mtime == _cfg_export_mtime:
+        return
+
     config_data = {}
     try:
         config_data['app'] = {
@@ -156,8 +201,10 @@ def export_config_to_json():
                 online_sdrs_list[name] = {'url': url, 'type': sdr_type}
         config_data['online_sdrs'] = {'list_of_sdrs': online_sdrs_list}
 
+        payload = json.dumps(config_data, indent=4)
         with open(CONFIG_JSON_FILE, 'w') as f:
-            json.dump(config_data, f, indent=4)
+            f.write(payload)
+        _cfg_export_mtime = config_mtime
         logger.debug(f"Config exported to {CONFIG_JSON_FILE}")
     except IOError as e:
         logger.error(f"Failed to write config JSON file {CONFIG_JSON_FILE}: {e}")
@@ -180,29 +227,22 @@ def sdr_scan_and_decode_thread(sdr_id, manager_instance, running_flag):
             running_flag.clear() # Stop this thread if SDR can't open
             return
 
-        scan_frequencies = {
-            "hfgcs": [4724000, 6739000, 8992000, 11175000, 13200000, 15016000],
-            "js8": [7078000, 14078000], # Example JS8 frequencies
-            "adsb": [1090000000], # ADS-B frequency (1090 MHz)
-        }
-        
         current_freq_idx = 0
         
         while running_flag.is_set(): # Check if this specific SDR's thread is active
             try:
-                # --- Polling config for service enable/disable ---
-                config.read(CONFIG_FILE_PATH) # Re-read config periodically
-                hfgcs_enabled_in_config = config.getboolean('scan_services', 'hfgcs', fallback=False)
-                js8_enabled_in_config = config.getboolean('scan_services', 'js8', fallback=False)
-                adsb_enabled_in_config = config.getboolean('scan_services', 'adsb', fallback=False) # New ADS-B enable flag
+                # --- Service enable/disable, kept current by main_app_loop's config.ini polling ---
+                hfgcs_enabled_in_config = hfgcs_scan_enabled
+                js8_enabled_in_config = js8_scan_enabled
+                adsb_enabled_in_config = adsb_scan_enabled
 
                 active_frequencies = []
                 if hfgcs_enabled_in_config:
-                    active_frequencies.extend(scan_frequencies["hfgcs"])
+                    active_frequencies.extend(HFGCS_FREQS_HZ)
                 if js8_enabled_in_config:
-                    active_frequencies.extend(scan_frequencies["js8"])
+                    active_frequencies.extend(JS8_FREQS_HZ)
                 if adsb_enabled_in_config: # Add ADS-B frequencies if enabled
-                    active_frequencies.extend(scan_frequencies["adsb"])
+                    active_frequencies.extend(ADSB_FREQS_HZ)
                 
                 if not active_frequencies:
                     logger.debug(f"Device {sdr_id}: No scanning services enabled. Sleeping.")
@@ -217,7 +257,7 @@ def sdr_scan_and_decode_thread(sdr_id, manager_instance, running_flag):
                 # Capture samples
                 # Adjust sample rate for ADS-B if needed, as it's a very wideband signal
                 capture_samples_duration = 2 # seconds
-                if target_freq == 1090000000: # For ADS-B
+                if target_freq in ADSB_FREQS_SET: # For ADS-B
                     # ADS-B typically needs higher sample rates, but RTL-SDR limits us.
                     # For a real ADS-B decoder, you'd use a dedicated tool like dump1090.
                     # Here, we just simulate capture.
@@ -233,7 +273,7 @@ def sdr_scan_and_decode_thread(sdr_id, manager_instance, running_flag):
 
                 # --- Placeholder for DSP and Decoding ---
                 # Dummy HFGCS Decoder
-                if hfgcs_enabled_in_config and (time.time() % 30 < 2) and (target_freq in scan_frequencies["hfgcs"]): # Simulate every 30s
+                if hfgcs_enabled_in_config and (time.time() % 30 < 2) and (target_freq in HFGCS_FREQS_SET): # Simulate every 30s
                     decoded_message = "Simulated HFGCS Voice Message: 'TEST TEST, OVER!'"
                     callsign = "DUMMY_C"
                     raw_content_path = save_audio_recording(samples, target_freq, "USB", sdr_id)
@@ -250,7 +290,7 @@ def sdr_scan_and_decode_thread(sdr_id, manager_instance, running_flag):
                     logger.info(f"Simulated HFGCS message recorded on {target_freq/1e3} kHz from {sdr_id}.")
 
                 # Dummy JS8 Decoder
-                if js8_enabled_in_config and (time.time() % 40 < 2) and (target_freq in scan_frequencies["js8"]): # Simulate every 40s
+                if js8_enabled_in_config and (time.time() % 40 < 2) and (target_freq in JS8_FREQS_SET): # Simulate every 40s
                     decoded_message = "Simulated JS8 Message: 'CQ CQ CQ DE K1SPY'"
                     callsign = "K1SPY"
                     raw_content_path = save_audio_recording(samples, target_freq, "JS8", sdr_id)
@@ -267,7 +307,7 @@ def sdr_scan_and_decode_thread(sdr_id, manager_instance, running_flag):
                     logger.info(f"Simulated JS8 message recorded on {target_freq/1e3} kHz from {sdr_id}.")
 
                 # Dummy ADS-B Decoder (very basic simulation)
-                if adsb_enabled_in_config and (time.time() % 20 < 2) and (target_freq == 1090000000): # Simulate every 20s
+                if adsb_enabled_in_config and (time.time() % 20 < 2) and (target_freq in ADSB_FREQS_SET): # Simulate every 20s
                     decoded_message = f"Simulated ADS-B: Aircraft ABCDEF, Lat: 36.1, Lon: -86.7, Alt: 10000ft"
                     callsign = "N/A" # ADS-B typically uses ICAO hex codes, not callsigns
                     raw_content_path = save_audio_recording(samples, target_freq, "ADS-B", sdr_id) # Even though it's not audio
@@ -303,7 +343,7 @@ def save_audio_recording(samples, frequency_hz, mode, sdr_id):
     For now, this just creates a dummy file.
     """
     # Sanitize sdr_id for filename
-    sanitized_sdr_id = re.sub(r'[^a-zA-Z0-9_.-]', '_', str(sdr_id))
+    sanitized_sdr_id = _UNSAFE_FILENAME_CHARS_RE.sub('_', str(sdr_id))
     filename = f"rec_{sanitized_sdr_id}_{int(frequency_hz/1000)}_{mode}_{datetime.now().strftime('%Y%m%d%H%M%S')}.mp3"
     filepath = os.path.join(RECORDINGS_DIR, filename)
     
@@ -332,9 +372,12 @@ def create_sample_recordings():
         "online_sample2.mp3",
         "online_sample3.mp3"
     ]
+    # One directory scan instead of an exists() stat per sample; the recordings dir was created at startup
+    with os.scandir(RECORDINGS_DIR) as entries:
+        existing = {entry.name for entry in entries}
     for filename in sample_recordings:
         filepath = os.path.join(RECORDINGS_DIR, filename)
-        if not os.path.exists(filepath):
+        if filename not in existing:
             try:
                 with open(filepath, 'w') as f:
                     f.write(f"Dummy content for {filename}")
@@ -345,6 +388,17 @@ def create_sample_recordings():
 
 # --- Main Application Loop ---
 
+@lru_cache(maxsize=1)
+def _bootstrap():
+    """
+    One-time startup work (database tables, sample recordings).
+    Kept out of module import so importing hfgcs.py does not block on SQLite.
+    """
+    data_store.initialize_db()
+    # Create dummy sample recordings on startup
+    create_sample_recordings()
+    return True
+
 def main_app_loop():
     """
     Main loop for HFGCSpy, managing SDR threads and periodic tasks.
@@ -352,16 +406,14 @@ def main_app_loop():
     global hfgcs_scan_enabled, js8_scan_enabled, adsb_scan_enabled # Add adsb_scan_enabled
     global selected_sdr_devices
 
+    _bootstrap()
     logger.info("HFGCSpy main application loop started.")
 
-    # Create dummy sample recordings on startup
-    create_sample_recordings()
-
     # Main loop for managing services and exporting data
     while True:
         try:
-            # Periodically re-read config for updated service enablement and SDR selection
-            config.read(CONFIG_FILE_PATH)
+            # Re-read config for updated service enablement and SDR selection, but only once it has changed
+            reload_config_if_changed()
             
             # Update service enable flags
             hfgcs_scan_enabled = config.getboolean('scan_services', 'hfgcs', fallback=False)
@@ -3,14 +3,21 @@
 # This script handles all installation, configuration, and service management.
 # Version: 2.2.44 # Version bump for Dockerfile changes (venv PATH, ldconfig)
 
+# Only modules used on every code path are imported here. subprocess, shutil, json, socket,
+# concurrent.futures, argparse and the other heavier modules are imported inside the functions that
+# need them, so --help and quick commands like --status and --stop don't pay for them at startup.
+from __future__ import annotations # Annotations stay unevaluated strings, so Final needs no runtime import
+
 import os
 import sys
-import subprocess
-import configparser
-import shutil
-import re
-import argparse
-import time # Import time module for sleep
+import functools
+import stat
+import threading
+
+# typing is only needed by type checkers, which treat any TYPE_CHECKING name as True
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Final
 
 # --- Script Version ---
 __version__ = "2.2.44" # Updated version for Dockerfile changes (venv PATH, ldconfig)
@@ -18,16 +25,65 @@ __version__ = "2.2.44" # Updated version for Dockerfile changes (venv PATH, ldco
 # --- Configuration Constants (Defined directly in setup.py) ---
 # All constants are now embedded directly in this file to avoid import issues.
 HFGCSPY_REPO = "https://github.com/sworrl/HFGCSpy.git" # IMPORTANT: Ensure this is correct!
+HFGCSPY_TARBALL_URL = "https://github.com/sworrl/HFGCSpy/archive/refs/heads/main.tar.gz" # Work tree only, no .git
 HFGCSPY_SERVICE_NAME = "hfgcspy_docker.service" # Service name is constant
 HFGCSPY_DOCKER_IMAGE_NAME = "hfgcspy_image"
 HFGCSPY_DOCKER_CONTAINER_NAME = "hfgcspy_app" 
+HFGCSPY_REVISION_LABEL = "hfgcspy.revision" # Image label holding the Git commit the image was built from
 HFGCSPY_INTERNAL_PORT = "8002" # Port for Flask/Gunicorn INSIDE Docker container
 
 # Default installation paths on the HOST system
-APP_DIR_DEFAULT = "/opt/hfgcspy" # Where the git repo is cloned on host
-WEB_ROOT_DIR_DEFAULT = "/var/www/html/hfgcspy" # Where static web UI files are copied (still defined for consistency, but not used for Apache)
+APP_DIR_DEFAULT: Final = "/opt/hfgcspy" # Where the git repo is cloned on host
+WEB_ROOT_DIR_DEFAULT: Final = "/var/www/html/hfgcspy" # Where static web UI files are copied (still defined for consistency, but not used for Apache)
 DOCKER_VOLUME_NAME = "hfgcspy_data_vol" # Docker volume for SQLite DB and recordings
 
+# File and directory names that make up the install layout (single source for path building and detection)
+CONFIG_FILE_NAME: Final = "config.ini"
+DATA_SUBDIR_NAME: Final = "hfgcspy_data" # Under WEB_ROOT_DIR
+STATUS_JSON_FILE_NAME: Final = "status.json"
+CONFIG_JSON_FILE_NAME: Final = "config.json"
+INSTALL_STATE_FILE_NAME: Final = ".install_state.json" # config.ini mtime and values last written by configure_hfgcspy_app
+
+# Host-local files in the app dir that are moved aside and restored when --install wipes and re-clones it.
+# config.ini is tracked upstream, so it isn't among them: its local values are merged into the fresh copy instead.
+PRESERVED_APP_FILES = (INSTALL_STATE_FILE_NAME,)
+
+# systemd unit for the container, rendered with format_map in setup_systemd_service().
+# systemd only treats '#' as a comment at the start of a line, so comments sit on their own lines.
+_SERVICE_UNIT_TEMPLATE: Final = """
+[Unit]
+Description=HFGCSpy SDR Scanner and Parser (Docker Container)
+After=network.target docker.service
+Requires=docker.service
+
+[Service]
+ExecStart=/usr/bin/docker start -a {container_name}
+ExecStop=/usr/bin/docker stop {container_name}
+ExecReload=/usr/bin/docker restart {container_name}
+Restart=always
+# User to run docker commands (must be in docker group)
+User={user}
+
+[Install]
+WantedBy=multi-user.target
+"""
+
+# Kernel modules that claim RTL2832U dongles as DVB-T tuners; blacklisted so rtl-sdr can use the device
+DVB_BLACKLIST_CONTENT = "blacklist dvb_usb_rtl28xxu\nblacklist rtl2832\nblacklist rtl2830\n"
+
+# Host packages installed in a single apt transaction by install_system_dependencies
+APT_PACKAGES = [
+    "git", "python3", "python3-venv", "build-essential",
+    "libusb-1.0-0-dev", "libatlas-base-dev", "libopenblas-dev",
+    "rtl-sdr",
+]
+
+# Docker Engine packages from Docker's own apt repo; added to the same apt transaction when Docker is missing
+DOCKER_APT_PACKAGES = ["docker-ce", "docker-ce-cli", "containerd.io", "docker-buildx-plugin", "docker-compose-plugin"]
+
+# Tail of the status_file path written to config.ini; whatever precedes it is the web root
+_STATUS_PATH_SUFFIX: Final = f"/{DATA_SUBDIR_NAME}/{STATUS_JSON_FILE_NAME}"
+
 # --- Global Path Variables (Initialized to None, will be set by _set_global_paths_runtime) ---
 # These are the variables that will hold the *actual* paths during script execution.
 # They are declared here, and their concrete values (derived from defaults or user input)
@@ -35,15 +91,23 @@ DOCKER_VOLUME_NAME = "hfgcspy_data_vol" # Docker volume for SQLite DB and record
 HFGCSpy_APP_DIR = None 
 HFGCSpy_VENV_DIR = None 
 HFGCSpy_CONFIG_FILE = None
+HFGCSpy_CONFIG_TEMPLATE_FILE = None
+HFGCSpy_GIT_DIR = None
+HFGCSpy_INSTALL_STATE_FILE = None
 
 WEB_ROOT_DIR = None # No longer directly used for serving, but kept for consistency with data paths
 HFGCSPY_DATA_DIR = None
 HFGCSPY_RECORDINGS_PATH = None
 HFGCSPY_CONFIG_JSON_PATH = None
+HFGCSPY_STATUS_JSON_PATH = None
+HFGCSPY_MESSAGES_JSON_PATH = None
 
 
 # --- Helper Functions (Ensured to be correctly defined and callable) ---
 
+# Set HFGCSPY_QUIET=1 to drop INFO messages (including run_command's command echo); warnings and errors still print
+LOG_INFO = os.environ.get("HFGCSPY_QUIET") != "1"
+
 # Define colors for output globally
 RED='\033[0;31m'
 GREEN='\033[1;32m' # Light green for info
@@ -51,73 +115,266 @@ YELLOW='\033[0;33m'
 CYAN='\033[1;36m' # Bold cyan for sections
 NC='\033[0m' # No Color - MUST be defined globally for f-strings
 
-def log_info(message):
-    print(f"\n\033[1;32mINFO: {message}{NC}") # Light Green text for info
+# Set per worker thread by _buffered_output() so parallel install steps don't interleave their output
+_output = threading.local()
+_output_lock = threading.Lock()
+
+def _write(text):
+    """Writes text to stdout, or to the calling thread's buffer while it runs under _buffered_output()."""
+    buffer = getattr(_output, 'buffer', None)
+    if buffer is None:
+        sys.stdout.write(text)
+    else:
+        buffer.append(text)
+
+def _buffered_output(func, *args):
+    """Runs func(*args) with this thread's output held back, then writes it to stdout in one block, also on failure."""
+    _output.buffer = []
+    try:
+        return func(*args)
+    finally:
+        text = ''.join(_output.buffer)
+        _output.buffer = None
+        with _output_lock:
+            sys.stdout.write(text)
+            sys.stdout.flush()
+
+# Colored line prefixes, built once; each log call is then a single write
+_INFO_PREFIX = f"\n{GREEN}INFO: " # Light Green text for info
+_WARN_PREFIX = f"\n{YELLOW}WARNING: " # Yellow text for warnings
+_ERROR_PREFIX = f"\n{RED}ERROR: " # Red text for errors
+_SUCCESS_PREFIX = f"\n{GREEN}SUCCESS: " # Light Green text for success
+_SECTION_PREFIX = f"\n{CYAN}--- " # Bold cyan for sections
+_LINE_END = f"{NC}\n"
+
+# Messages take %-style arguments like the logging module; they are only interpolated when printed.
+def log_info(message, *args):
+    if not LOG_INFO:
+        return
+    _write(_INFO_PREFIX + (message % args if args else message) + _LINE_END)
 
-def log_warn(message):
-    print(f"\n\033[0;33mWARNING: {message}{NC}") # Yellow text for warnings
+def log_warn(message, *args):
+    _write(_WARN_PREFIX + (message % args if args else message) + _LINE_END)
 
-def log_error(message, exit_code=1):
-    print(f"\n\033[0;31mERROR: {message}{NC}") # Red text for errors
+def log_error(message, *args, exit_code=1):
+    _write(_ERROR_PREFIX + (message % args if args else message) + _LINE_END)
     sys.exit(exit_code)
 
-def log_success(message):
-    print(f"\n\033[1;32mSUCCESS: {message}{NC}") # Light Green text for success
+def log_success(message, *args):
+    _write(_SUCCESS_PREFIX + (message % args if args else message) + _LINE_END)
 
 def log_section(title):
-    # Explicitly concatenate NC to ensure it's always part of the string literal
-    print("\n\033[1;36m--- " + title + " ---" + NC) # Bold cyan for sections
+    _write(_SECTION_PREFIX + title + " ---" + _LINE_END)
 
 
+# Accepted answers for ask_yes_no(); an empty answer means the prompt's default
+_YES_NO_ANSWERS: Final = {'y': True, 'yes': True, 'n': False, 'no': False}
+
 def ask_yes_no(question, default_yes=True): # Modified to accept default
+    prompt = f"{question} (Y/n): " if default_yes else f"{question} (y/N): "
     while True:
-        if default_yes:
-            response = input(f"{question} (Y/n): ").lower().strip()
-            if response == '' or response == 'y':
-                return True
-            elif response == 'n':
-                return False
-            else:
-                print("Please answer Y or n.")
-        else:
-            response = input(f"{question} (y/N): ").lower().strip()
-            if response == 'y':
-                return True
-            elif response == '' or response == 'n':
-                return False
-            else:
-                print("Please answer y or N.")
-
-def run_command(command, check_return=True, capture_output=False, shell=False):
-    log_info(f"Executing: {' '.join(command) if isinstance(command, list) else command}")
+        try:
+            response = input(prompt).strip().lower()
+        except EOFError:
+            # No terminal to answer (e.g. stdin redirected from /dev/null): take the default instead of crashing
+            print()
+            return default_yes
+        if not response:
+            return default_yes
+        answer = _YES_NO_ANSWERS.get(response)
+        if answer is not None:
+            return answer
+        print("Please answer Y or n." if default_yes else "Please answer y or N.")
+
+# How long run_command waits after SIGTERM'ing a command that ran past its timeout before it sends SIGKILL
+TIMEOUT_KILL_GRACE_SECONDS = 2
+
+def _spawn_streaming(command, env=None):
+    """
+    Runs an argv list with the installer's own stdin/stdout/stderr and returns its exit code.
+    posix_spawnp skips Popen's pipe setup and communicate() loop, and output reaches the terminal as it is written.
+    """
+    sys.stdout.flush() # Keep our buffered log lines ahead of the child's output
+    pid = os.posix_spawnp(command[0], command, os.environ if env is None else env)
+    _, status = os.waitpid(pid, 0)
+    return os.waitstatus_to_exitcode(status)
+
+def run_command(command, check_return=True, capture_output=False, env=None, input=None, cwd=None, timeout=None, stream=False):
+    import shutil
+    import subprocess
+
+    if LOG_INFO:
+        log_info("Executing: %s", command if isinstance(command, str) else ' '.join(command))
     try:
+        # stream=True is for long, chatty commands whose output is only shown, never inspected (apt, docker build, git clone).
+        # Anything needing input, a cwd or a timeout, or running under _buffered_output(), still goes through subprocess.Popen below.
+        if (stream and not capture_output and input is None and cwd is None and timeout is None
+                and getattr(_output, 'buffer', None) is None):
+            returncode = _spawn_streaming(command, env)
+            if check_return and returncode != 0:
+                log_error("Command failed with exit code %s (see output above).", returncode)
+            return subprocess.CompletedProcess(command, returncode)
+
         # Always capture output to display on error, regardless of capture_output flag
-        result = subprocess.run(command, check=False, capture_output=True, text=True, shell=shell) 
+        # Commands are always argv lists exec'd directly; no /bin/sh in between
+        # close_fds=False plus an absolute executable lets subprocess use posix_spawn (vfork+exec) instead of fork+exec.
+        # Safe because Python creates its fds non-inheritable; the child only gets the pipes subprocess sets up.
+        with subprocess.Popen(command, executable=shutil.which(command[0]), close_fds=False,
+                              stdin=None if input is None else subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                              text=True, env=env, cwd=cwd) as process:
+            try:
+                stdout, stderr = process.communicate(input, timeout=timeout)
+                result = subprocess.CompletedProcess(command, process.returncode, stdout, stderr)
+            except subprocess.TimeoutExpired:
+                # Like 'timeout -k': SIGTERM first, SIGKILL only after a grace period. rtl_test handles SIGTERM by
+                # cancelling its USB transfers and releasing the dongle; a SIGKILL can leave it claimed until replugged.
+                process.terminate()
+                try:
+                    stdout, stderr = process.communicate(timeout=TIMEOUT_KILL_GRACE_SECONDS)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                    stdout, stderr = process.communicate()
+                # Keep what it printed so far and report coreutils timeout's exit status (124)
+                result = subprocess.CompletedProcess(command, 124, stdout, stderr)
         
         if check_return and result.returncode != 0:
-            log_error(f"Command failed with exit code {result.returncode}.\nStderr: {result.stderr.strip()}\nStdout: {result.stdout.strip()}")
+            log_error("Command failed with exit code %s.\nStderr: %s\nStdout: %s", result.returncode, result.stderr.strip(), result.stdout.strip())
         
         # Always print stdout and stderr if not explicitly capturing output for return value
         if not capture_output:
             if result.stdout:
-                print(result.stdout.strip())
+                _write(result.stdout.strip() + "\n")
             if result.stderr:
-                print(result.stderr.strip())
+                _write(result.stderr.strip() + "\n")
         
         if capture_output:
             return result.stdout.strip()
         return result # Return the CompletedProcess object for non-captured output calls
     except subprocess.CalledProcessError as e:
         # This block might not be reached with check=False, but keep for robustness
-        log_error(f"Command failed with exit code {e.returncode}.\nStderr: {e.stderr.strip()}\nStdout: {e.stdout.strip()}")
+        log_error("Command failed with exit code %s.\nStderr: %s\nStdout: %s", e.returncode, e.stderr.strip(), e.stdout.strip())
     except FileNotFoundError:
-        log_error(f"Command not found: {command[0] if isinstance(command, list) else command.split(' ')[0]}")
+        log_error("Command not found: %s", command[0] if isinstance(command, list) else command.split(' ')[0])
     except Exception as e:
-        log_error(f"An unexpected error occurred while running command: {e}")
+        log_error("An unexpected error occurred while running command: %s", e)
+
+# Set once 'apt-get update' has run in this process, so later installs know whether the package lists are fresh
+_apt_lists_refreshed = False
+
+def _apt_update():
+    """Refreshes the package lists and records that it did."""
+    global _apt_lists_refreshed
+    _apt_get(["update"])
+    _apt_lists_refreshed = True
+
+def _apt_get(args, check_return=True):
+    """
+    Runs 'apt-get <args>' quietly and without prompts: -qq, no dpkg progress pty, noninteractive debconf.
+    All apt calls go through here; apt-get is the stable scripting interface (apt warns when piped).
+    No 'sudo': every caller runs under check_root(), and sudo's env_reset would drop DEBIAN_FRONTEND.
+    """
+    return run_command(["apt-get", "-qq", "-y", "-o", "Dpkg::Use-Pty=0"] + args,
+                       check_return=check_return, env={**os.environ, "DEBIAN_FRONTEND": "noninteractive"}, stream=True)
+
+def _port_is_listening(host, port, timeout=2):
+    """Returns True if a TCP connection to host:port succeeds (in-process, no netstat/grep subprocesses)."""
+    import socket
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+def _print_http_response(url, timeout=5):
+    """Fetches url in-process (no curl subprocess) and prints the body, or the error if the request fails."""
+    import urllib.error
+    import urllib.request
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            print(response.read().decode(errors='replace'))
+    except urllib.error.HTTPError as e:
+        print(f"HTTP {e.code}: {e.read().decode(errors='replace')}")
+    except (urllib.error.URLError, OSError) as e:
+        print(f"Request failed: {e}")
+
+def _print_file(path):
+    """Prints a text file's contents in-process (no cat subprocess); a missing or unreadable file prints nothing."""
+    try:
+        with open(path, 'r', errors='replace') as f:
+            sys.stdout.write(f.read())
+    except OSError:
+        pass
+
+def _print_path_mode(path):
+    """Prints an 'ls -ld'-style line (mode, owner, group, path) from a single os.stat, without spawning ls."""
+    import grp
+    import pwd
+    try:
+        st = os.stat(path)
+    except OSError as e:
+        print(f"{path}: {e.strerror}")
+        return
+    try:
+        owner = pwd.getpwuid(st.st_uid).pw_name
+    except KeyError:
+        owner = str(st.st_uid)
+    try:
+        group = grp.getgrgid(st.st_gid).gr_name
+    except KeyError:
+        group = str(st.st_gid)
+    print(f"{stat.filemode(st.st_mode)} {owner} {group} {path}")
+
+@functools.lru_cache(maxsize=1)
+def _invoking_user():
+    """The user who ran 'sudo setup.py', else the login user. Resolved once; several install steps need it."""
+    return os.getenv("SUDO_USER") or os.getlogin()
+
+@functools.lru_cache(maxsize=None)
+def _uid_gid(user):
+    """Returns (uid, primary gid) for user from one passwd lookup. Cached: the same users are looked up more than once per run."""
+    import pwd
+    entry = pwd.getpwnam(user)
+    return entry.pw_uid, entry.pw_gid
+
+def _user_in_group(user, group):
+    """Returns True if user belongs to group (as a supplementary member or by primary gid), from the group/passwd databases."""
+    import grp
+    try:
+        group_entry = grp.getgrnam(group)
+    except KeyError:
+        return False # Group doesn't exist (yet)
+    if user in group_entry.gr_mem:
+        return True
+    try:
+        return _uid_gid(user)[1] == group_entry.gr_gid
+    except KeyError:
+        return False
 
 def check_root():
+    # geteuid() is a plain syscall; no 'id -u' process needed
     if os.geteuid() != 0:
-        log_error("This script must be run with sudo. Please run: sudo python3 setup.py --install") # Updated command for user
+        log_error("This script must be run with sudo. Please run: sudo python3 setup.py %s", ' '.join(sys.argv[1:]) or '--install')
+
+def _atomic_write(path, content, mode=0o644, uid=-1, gid=-1):
+    """
+    Writes content (str or bytes) to a sibling temp file and renames it over path, so a crash never leaves a partial file.
+    The data goes straight to the fd with os.write (no buffered file object) and is fsync'ed before the rename.
+    The new file is root-owned unless uid/gid are given (-1 leaves that id as is), since the rename replaces the inode.
+    """
+    data = content.encode() if isinstance(content, str) else content
+    tmp_path = f"{path}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_CLOEXEC, mode)
+    try:
+        if uid != -1 or gid != -1:
+            os.fchown(fd, uid, gid)
+            os.fchmod(fd, mode) # Exact mode, not narrowed by the umask
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):] # os.write may write less than asked
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    os.replace(tmp_path, path)
 
 # --- Path Management Functions ---
 
@@ -128,61 +385,82 @@ def _set_global_paths_runtime(app_dir_val, web_root_dir_val):
     This function should be called explicitly in main() after base paths are determined.
     """
     global HFGCSpy_APP_DIR, HFGCSpy_VENV_DIR, HFGCSpy_CONFIG_FILE
+    global HFGCSpy_CONFIG_TEMPLATE_FILE, HFGCSpy_GIT_DIR, HFGCSpy_INSTALL_STATE_FILE
     global WEB_ROOT_DIR, HFGCSpy_DATA_DIR, HFGCSPY_RECORDINGS_PATH, HFGCSPY_CONFIG_JSON_PATH
+    global HFGCSPY_STATUS_JSON_PATH, HFGCSPY_MESSAGES_JSON_PATH
 
+    # This installer only runs on Linux, so paths are built with plain '/' f-strings rather than os.path.join.
     HFGCSpy_APP_DIR = app_dir_val
-    HFGCSpy_VENV_DIR = os.path.join(HFGCSpy_APP_DIR, "venv") # Still defined, but not used by Docker app directly
-    HFGCSpy_CONFIG_FILE = os.path.join(HFGCSpy_APP_DIR, "config.ini")
+    HFGCSpy_VENV_DIR = f"{HFGCSpy_APP_DIR}/venv" # Still defined, but not used by Docker app directly
+    HFGCSpy_CONFIG_FILE = f"{HFGCSpy_APP_DIR}/{CONFIG_FILE_NAME}"
+    HFGCSpy_CONFIG_TEMPLATE_FILE = f"{HFGCSpy_CONFIG_FILE}.template"
+    HFGCSpy_GIT_DIR = f"{HFGCSpy_APP_DIR}/.git"
+    HFGCSpy_INSTALL_STATE_FILE = f"{HFGCSpy_APP_DIR}/{INSTALL_STATE_FILE_NAME}"
     
     WEB_ROOT_DIR = web_root_dir_val
-    HFGCSpy_DATA_DIR = os.path.join(WEB_ROOT_DIR, "hfgcspy_data")
-    HFGCSPY_RECORDINGS_PATH = os.path.join(HFGCSpy_DATA_DIR, "recordings")
-    HFGCSPY_CONFIG_JSON_PATH = os.path.join(HFGCSpy_DATA_DIR, "config.json")
+    HFGCSpy_DATA_DIR = f"{WEB_ROOT_DIR}/{DATA_SUBDIR_NAME}"
+    HFGCSPY_RECORDINGS_PATH = f"{HFGCSpy_DATA_DIR}/recordings"
+    HFGCSPY_CONFIG_JSON_PATH = f"{HFGCSpy_DATA_DIR}/{CONFIG_JSON_FILE_NAME}"
+    HFGCSPY_STATUS_JSON_PATH = f"{HFGCSpy_DATA_DIR}/{STATUS_JSON_FILE_NAME}"
+    HFGCSPY_MESSAGES_JSON_PATH = f"{HFGCSpy_DATA_DIR}/messages.json"
 
-def _load_paths_from_config():
-    """Attempts to load installed paths from config.ini into global variables."""
-    # This function will call _update_global_paths_runtime once it has determined the base directories.
-    
-    config_read = configparser.ConfigParser()
-    installed_config_path = os.path.join(APP_DIR_DEFAULT, "config.ini") # Use constant APP_DIR_DEFAULT 
+def _read_ini_value(path, section, option):
+    """
+    Returns one option's value from an INI file, or None if it isn't set.
+    A line scanner that stops at the first match, for callers that only need a single key
+    and don't want to import and run ConfigParser. Raises OSError if the file can't be read.
+    """
+    option = option.lower() # ConfigParser option names are case-insensitive
+    in_section = False
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line[0] in '#;':
+                continue
+            if line[0] == '[':
+                in_section = line[1:line.find(']')].strip() == section
+            elif in_section:
+                # Like ConfigParser, split on whichever of '=' or ':' comes first
+                for i, ch in enumerate(line):
+                    if ch in '=:':
+                        if line[:i].strip().lower() == option:
+                            return line[i + 1:].strip()
+                        break
+    return None
+
+@functools.lru_cache(maxsize=1)
+def _detect_installed_paths():
+    """
+    Deduces the installed (app_dir, web_root_dir) pair from config.ini in the default app directory.
+    Falls back to the defaults if config.ini is missing or unreadable.
+    Cached, so config.ini is read and parsed at most once per run.
+    """
+    # The app is always cloned to the default host path; only the web root is recorded in config.ini.
+    # Start from the defaults and overwrite only when config.ini yields a usable status_file path.
+    app_dir_from_config = APP_DIR_DEFAULT
+    web_root_dir_from_config = WEB_ROOT_DIR_DEFAULT
 
-    if os.path.exists(installed_config_path):
-        try:
-            config_read.read(installed_config_path)
-            # Database path is absolute, use it to deduce installed app_dir
-            # For Dockerized app, database_path in config.ini is now relative to container's /app
-            # So we need to derive host path from WEB_ROOT_DIR
-            app_dir_from_config = APP_DIR_DEFAULT # Assume app is always cloned to default host path
-
-            web_root_dir_from_config = WEB_ROOT_DIR_DEFAULT # Default fallback
-            if config_read.has_section('app_paths') and config_read.has_option('app_paths', 'status_file'):
-                full_status_path = config_read.get('app_paths', 'status_file')
-                match = re.search(r"^(.*)/hfgcspy_data/status\.json$", full_status_path)
-                if match:
-                    web_root_dir_from_config = match.group(1)
-                else:
-                    log_warn(f"Could not reliably deduce WEB_ROOT_DIR from status_file path in config.ini: {full_status_path}. Using default.")
-            else:
-                log_warn("app_paths section or status_file option missing in config.ini. Using default WEB_ROOT_DIR.")
-
-            # If app_dir_from_config is empty (e.g., config.ini is minimal or old), use default base
-            if not app_dir_from_config: app_dir_from_config = APP_DIR_DEFAULT
-
-            _set_global_paths_runtime(app_dir_from_config, web_root_dir_from_config)
-            log_info(f"Loaded install paths from config: App='{HFGCSpy_APP_DIR}', Web='{WEB_ROOT_DIR}'")
-            return True # Paths loaded successfully
-        except configparser.Error as e:
-            log_warn(f"Error reading config.ini for paths: {e}. Falling back to default paths.")
-            _set_global_paths_runtime(APP_DIR_DEFAULT, WEB_ROOT_DIR_DEFAULT) # Ensure paths are reset to defaults
-            return False
-    else:
+    try:
+        full_status_path = _read_ini_value(f"{APP_DIR_DEFAULT}/{CONFIG_FILE_NAME}", 'app_paths', 'status_file')
+    except OSError:
         log_warn("config.ini not found at default app directory. Using default paths.")
-        _set_global_paths_runtime(APP_DIR_DEFAULT, WEB_ROOT_DIR_DEFAULT) # Ensure paths are set even if config not found
-        return False
+        return app_dir_from_config, web_root_dir_from_config
+
+    if full_status_path is None:
+        log_warn("app_paths section or status_file option missing in config.ini. Using default WEB_ROOT_DIR.")
+    elif full_status_path.endswith(_STATUS_PATH_SUFFIX):
+        web_root_dir_from_config = full_status_path[:-len(_STATUS_PATH_SUFFIX)]
+    else:
+        log_warn("Could not reliably deduce WEB_ROOT_DIR from status_file path in config.ini: %s. Using default.", full_status_path)
+
+    log_info("Loaded install paths from config: App='%s', Web='%s'", app_dir_from_config, web_root_dir_from_config)
+    return app_dir_from_config, web_root_dir_from_config
 
 # --- Installation Steps ---
 
 def diagnose_and_fix_sdr_host():
+    import shutil
+
     log_info("Starting host-level SDR diagnostic and fix process.")
     
     # --- Initial SDR Hardware Detection on Host ---
@@ -203,36 +481,41 @@ def diagnose_and_fix_sdr_host():
 
     log_section("Checking dmesg for recent SDR-related Kernel Messages")
     log_info("Looking for messages from the last 50 lines.")
-    run_command(["dmesg", "|", "tail", "-n", "50", "|", "grep", "-i", "rtl"], shell=True, check_return=False)
-    run_command(["dmesg", "|", "tail", "-n", "50", "|", "grep", "-i", "dvb"], shell=True, check_return=False)
+    recent_kernel_lines = run_command(["dmesg"], capture_output=True, check_return=False).splitlines()[-50:]
+    for keyword in ("rtl", "dvb"):
+        for line in recent_kernel_lines:
+            if keyword in line.lower():
+                print(line)
 
     log_section("Thorough Purge and Alternative Reinstallation of rtl-sdr Tools and Libraries")
-    log_info("Purging existing rtl-sdr packages and development libraries.")
-    run_command(["sudo", "apt-get", "remove", "--purge", "rtl-sdr", "librtlsdr-dev", "-y"], check_return=False)
-    run_command(["sudo", "apt", "autoremove", "-y"])
-
-    log_info("Updating package lists.")
-    run_command(["sudo", "apt", "update", "-y"])
-
-    log_info("Installing build dependencies for rtl-sdr-blog.")
-    run_command(["sudo", "apt", "install", "cmake", "build-essential", "pkg-config", "debhelper", "-y"])
+    # One apt transaction: a trailing '-' on a package name asks 'install' to remove it, so the purge, the
+    # autoremove and the build-dependency install share a single resolver run and one round of dpkg triggers.
+    # 'apt-get update' only if --install hasn't already refreshed the lists (it skips apt when nothing is missing).
+    if not _apt_lists_refreshed:
+        _apt_update()
+    log_info("Purging existing rtl-sdr packages and installing build dependencies for rtl-sdr-blog.")
+    _apt_get(["install", "--purge", "--autoremove", "--no-install-recommends",
+              "cmake", "build-essential", "pkg-config", "debhelper",
+              "rtl-sdr-", "librtlsdr-dev-"])
 
     log_info("Cloning rtl-sdr-blog repository.")
     if os.path.exists("rtl-sdr-blog"):
         log_warn("rtl-sdr-blog directory already exists. Removing and re-cloning.")
         shutil.rmtree("rtl-sdr-blog")
-    run_command(["git", "clone", "https://github.com/rtlsdrblog/rtl-sdr-blog"])
+    run_command(["git", "clone", "https://github.com/rtlsdrblog/rtl-sdr-blog"], stream=True)
 
     log_info("Building Debian packages from rtl-sdr-blog source.")
-    current_dir = os.getcwd()
-    os.chdir("rtl-sdr-blog")
-    build_result = run_command(["sudo", "dpkg-buildpackage", "-b", "--no-sign"], check_return=False)
+    # cwd= applies to the child only; this process never changes directory
+    build_result = run_command(["sudo", "dpkg-buildpackage", "-b", "--no-sign"], check_return=False, cwd="rtl-sdr-blog")
     if build_result.returncode != 0:
         log_error("Failed to build rtl-sdr-blog packages. Check build output above for details.")
-    os.chdir(current_dir)
 
     log_info("Installing the newly built Debian packages.")
-    deb_files = [f for f in os.listdir(".") if f.endswith(".deb") and ("librtlsdr0" in f or "librtlsdr-dev" in f or "rtl-sdr" in f)]
+    # One scandir pass; DirEntry.is_file() is answered from the cached d_type without an extra stat()
+    with os.scandir(".") as entries:
+        deb_files = [e.name for e in entries
+                     if e.name.endswith(".deb") and e.is_file(follow_symlinks=False)
+                     and ("librtlsdr0" in e.name or "librtlsdr-dev" in e.name or "rtl-sdr" in e.name)]
     if not deb_files:
         log_error("No .deb packages found after building rtl-sdr-blog. Build might have failed.")
     else:
@@ -247,69 +530,52 @@ def diagnose_and_fix_sdr_host():
     log_section("Verifying and Reloading Kernel Module Blacklisting")
     BLACKLIST_FILE="/etc/modprobe.d/blacklist-rtl.conf"
     log_info(f"Checking content of {BLACKLIST_FILE}.")
-    if os.path.exists(BLACKLIST_FILE):
-        run_command(["cat", BLACKLIST_FILE])
-        with open(BLACKLIST_FILE, 'r') as f:
-            content = f.read()
-            if not ("blacklist dvb_usb_rtl28xxu" in content and \
-                    "blacklist rtl2832" in content and \
-                    "blacklist rtl2830" in content):
-                log_warn("Blacklist file exists but might be incomplete. Appending missing lines.")
-                subprocess.run(['sudo', 'tee', '-a', BLACKLIST_FILE], input="blacklist dvb_usb_rtl28xxu\nblacklist rtl2832\nblacklist rtl2830\n", text=True, check=True)
-            else:
-                log_info("Blacklist file appears correctly configured.")
-    else:
-        log_warn(f"{BLACKLIST_FILE} not found. Creating it with necessary blacklists.")
-        subprocess.run(['sudo', 'tee', BLACKLIST_FILE], input="blacklist dvb_usb_rtl28xxu\nblacklist rtl2832\nblacklist rtl2830\n", text=True, check=True)
-
-    log_info("Updating kernel module dependencies (depmod -a) and initramfs (update-initramfs -u).")
-    run_command(["sudo", "depmod", "-a"])
-    run_command(["sudo", "update-initramfs", "-u"])
+    _print_file(BLACKLIST_FILE)
+    # Same check-then-write as --install: depmod and update-initramfs only run when the file actually changes.
+    blacklist_dvb_modules()
 
     log_section("Verifying and Reloading udev Rules for Device Permissions")
     UDEV_RULES_DIR="/etc/udev/rules.d/"
-    UDEV_RULES_FILE="${UDEV_RULES_DIR}20-rtlsdr.rules" # Common name, sometimes 99-rtl-sdr.rules
+    UDEV_RULES_FILE=os.path.join(UDEV_RULES_DIR, "20-rtlsdr.rules") # Common name, sometimes 99-rtl-sdr.rules
+    ALT_UDEV_RULES_FILE=os.path.join(UDEV_RULES_DIR, "99-rtl-sdr.rules")
 
     log_info(f"Checking existence and permissions of /etc/udev/.")
-    run_command(["ls", "-ld", "/etc/udev/"], check_return=False)
+    _print_path_mode("/etc/udev/")
     log_info(f"Checking existence and permissions of {UDEV_RULES_DIR}.")
-    run_command(["ls", "-ld", UDEV_RULES_DIR], check_return=False)
+    _print_path_mode(UDEV_RULES_DIR)
 
 
     # Ensure the udev rules directory exists
     if not os.path.isdir(UDEV_RULES_DIR):
         log_warn(f"udev rules directory {UDEV_RULES_DIR} not found. Attempting to create it.")
-        run_command(["sudo", "mkdir", "-p", UDEV_RULES_DIR])
+        os.makedirs(UDEV_RULES_DIR, exist_ok=True) # Already root (check_root), so no 'sudo mkdir' process
     else:
         log_info(f"udev rules directory {UDEV_RULES_DIR} exists.")
 
     log_info(f"Checking for udev rules file: {UDEV_RULES_FILE}.")
 
     # Check if the common udev rules file exists or create a generic one
-    if not os.path.exists(UDEV_RULES_FILE) and not os.path.exists(os.path.join(UDEV_RULES_DIR, "99-rtl-sdr.rules")):
+    if not os.path.exists(UDEV_RULES_FILE) and not os.path.exists(ALT_UDEV_RULES_FILE):
         log_warn("No standard RTL-SDR udev rules file found. Creating a generic one.")
         log_info(f"Creating {UDEV_RULES_FILE} with basic read/write permissions for common RTL-SDRs.")
         udev_rules_content = """SUBSYSTEM=="usb", ATTRS{idVendor}=="0bda", ATTRS{idProduct}=="2832", MODE="0666", GROUP="plugdev", TAG+="uaccess"
 SUBSYSTEM=="usb", ATTRS{idVendor}=="0bda", ATTRS{idProduct}=="2838", MODE="0666", GROUP="plugdev", TAG+="uaccess"
 """ # Add other common RTL-SDR dongle IDs if needed
-        subprocess.run(['sudo', 'tee', UDEV_RULES_FILE], input=udev_rules_content, text=True, check=True)
+        _atomic_write(UDEV_RULES_FILE, udev_rules_content)
         log_info("Created a new udev rules file.")
     else:
         log_info("RTL-SDR udev rules file already exists. Content (if found):")
-        run_command(["cat", UDEV_RULES_FILE], check_return=False)
-        run_command(["cat", os.path.join(UDEV_RULES_DIR, "99-rtl-sdr.rules")], check_return=False)
+        _print_file(UDEV_RULES_FILE)
+        _print_file(ALT_UDEV_RULES_FILE)
 
     log_info("Reloading udev rules and triggering device re-scan.")
     run_command(["sudo", "udevadm", "control", "--reload-rules"])
     run_command(["sudo", "udevadm", "trigger"])
 
     log_section("Verifying Current User's Group Membership")
-    CURRENT_USER = os.getenv("SUDO_USER") or os.getlogin()
+    CURRENT_USER = _invoking_user()
     log_info(f"Checking groups for current user ({CURRENT_USER}).")
-    user_groups_output = run_command(["groups", CURRENT_USER], capture_output=True)
-    print(user_groups_output)
-
-    if "plugdev" not in user_groups_output:
+    if not _user_in_group(CURRENT_USER, "plugdev"):
         log_warn(f"User '{CURRENT_USER}' is NOT in the 'plugdev' group.")
         log_info(f"Attempting to add user '{CURRENT_USER}' to the 'plugdev' group.")
         run_command(["sudo", "usermod", "-aG", "plugdev", CURRENT_USER])
@@ -331,81 +597,242 @@ SUBSYSTEM=="usb", ATTRS{idVendor}=="0bda", ATTRS{idProduct}=="2838", MODE="0666"
         log_warn("A system REBOOT is still highly recommended to ensure all kernel module and user group changes are fully applied.")
         return True # SDR is now working on the host
 
-def install_docker():
+def setup_docker_apt_repo():
+    """
+    Adds Docker's apt repository if Docker Engine is missing and returns the packages to install from it
+    (empty if Docker is already installed). The packages go into the same apt transaction as APT_PACKAGES.
+    """
+    import shutil
+
     log_info("Checking if Docker Engine is already installed.")
-    try:
-        subprocess.run(["docker", "--version"], check=True, capture_output=True, text=True)
+    if shutil.which("docker") is not None:
         log_info("Docker Engine detected. Skipping installation.")
-        return
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        log_info("Docker Engine not found. Proceeding with installation.")
+        return []
+    log_info("Docker Engine not found. Proceeding with installation.")
 
-    log_info("Installing Docker Engine.")
+    log_info("Adding Docker's apt repository.")
     run_command(["sudo", "mkdir", "-p", "/etc/apt/keyrings"])
-    run_command(["curl", "-fsSL", "https://download.docker.com/linux/debian/gpg", "|", "sudo", "gpg", "--dearmor", "-o", "/etc/apt/keyrings/docker.gpg"], shell=True)
-
-    docker_repo_line = "deb [arch=$(dpkg --print-architecture) signed-by=/etc/apt/keyrings/docker.gpg] https://download.docker.com/linux/debian $(lsb_release -cs) stable"
-    run_command(["echo", docker_repo_line, "|", "sudo", "tee", "/etc/apt/sources.list.d/docker.list", ">", "/dev/null"], shell=True)
+    docker_key = run_command(["curl", "-fsSL", "https://download.docker.com/linux/debian/gpg"], capture_output=True)
+    run_command(["sudo", "gpg", "--dearmor", "--yes", "-o", "/etc/apt/keyrings/docker.gpg"], input=docker_key)
+
+    import platform
+    arch = run_command(["dpkg", "--print-architecture"], capture_output=True)
+    codename = platform.freedesktop_os_release().get("VERSION_CODENAME", "")
+    docker_repo_line = f"deb [arch={arch} signed-by=/etc/apt/keyrings/docker.gpg] https://download.docker.com/linux/debian {codename} stable\n"
+    _atomic_write("/etc/apt/sources.list.d/docker.list", docker_repo_line)
     
-    run_command(["sudo", "apt", "update"])
-    run_command(["sudo", "apt", "install", "-y", "docker-ce", "docker-ce-cli", "containerd.io", "docker-buildx-plugin", "docker-compose-plugin"])
+    return DOCKER_APT_PACKAGES
 
+def add_user_to_docker_group():
     log_info("Adding current user to 'docker' group to run Docker commands without sudo (requires logout/login).")
-    current_user = os.getenv("SUDO_USER") or os.getlogin()
+    current_user = _invoking_user()
+    if _user_in_group(current_user, "docker"):
+        log_info(f"User '{current_user}' is already in the 'docker' group.")
+        return
     run_command(["sudo", "usermod", "-aG", "docker", current_user])
     log_info("Docker installed. Please log out and log back in, or reboot, for Docker group changes to take effect.")
     log_info("You can then run 'docker run hello-world' to test Docker installation.")
 
 
-def install_system_dependencies():
-    log_info("Updating package lists and installing core system dependencies.")
-    run_command(["sudo", "apt", "update"])
-    run_command([
-        "sudo", "apt", "install", "-y", 
-        "git", "python3", "python3-venv", "build-essential", 
-        "libusb-1.0-0-dev", "libatlas-base-dev", "libopenblas-dev", "net-tools"
-    ])
+def _missing_apt_packages(packages):
+    """
+    Returns the packages dpkg doesn't report as installed, in their original order.
+    One dpkg-query for the whole list; names dpkg has never heard of only print an error and count as missing.
+    """
+    query = run_command(["dpkg-query", "-W", "-f=${Package} ${db:Status-Abbrev}\n"] + packages,
+                        capture_output=True, check_return=False) or ""
+    installed = {fields[0] for fields in (line.split() for line in query.splitlines())
+                 if len(fields) > 1 and fields[1] == "ii"}
+    return [package for package in packages if package not in installed]
+
+def download_system_dependencies(packages=APT_PACKAGES):
+    """Refreshes the package lists and fetches the packages into the apt cache without installing them."""
+    log_info("Updating package lists and downloading core system dependencies and rtl-sdr tools.")
+    _apt_update()
+    _apt_get(["install", "--download-only", "--no-install-recommends"] + packages)
+
+def install_system_dependencies(packages=APT_PACKAGES, update_lists=True):
+    log_info("Installing core system dependencies and rtl-sdr tools (apt version).")
+    if update_lists: # Skipped when download_system_dependencies() has just refreshed them
+        _apt_update()
+    # One apt-get transaction: dependencies are resolved and dpkg triggers run only once.
+    _apt_get(["install", "--no-install-recommends"] + packages)
+
+def _refresh_kernel_modules():
+    """Rebuilds module dependencies and the initramfs so a changed modprobe blacklist applies from boot."""
+    log_info("Updating kernel module dependencies (depmod -a) and initramfs (update-initramfs -u).")
+    run_command(["sudo", "depmod", "-a"])
+    run_command(["sudo", "update-initramfs", "-u"], stream=True)
 
-    log_info("Installing rtl-sdr tools (apt version).")
-    run_command(["sudo", "apt", "install", "-y", "rtl-sdr"])
-    
+def blacklist_dvb_modules(refresh_initramfs=True):
+    """
+    Makes sure the DVB-T drivers are blacklisted and returns True if the blacklist file had to be written.
+    With refresh_initramfs=False the caller runs _refresh_kernel_modules() itself, once its own apt work is done.
+    """
     log_info("Blacklisting conflicting DVB-T kernel modules.")
     blacklist_conf = "/etc/modprobe.d/blacklist-rtl.conf"
-    if not os.path.exists(blacklist_conf):
+    try:
+        with open(blacklist_conf, 'r') as f:
+            current = f.read()
+    except FileNotFoundError:
+        current = None
+
+    if current is None:
         log_warn(f"{blacklist_conf} not found. Creating it.")
-        subprocess.run(['sudo', 'tee', blacklist_conf], input="blacklist dvb_usb_rtl28xxu\nblacklist rtl2832\nblacklist rtl2830\n", text=True, check=True)
+        _atomic_write(blacklist_conf, DVB_BLACKLIST_CONTENT)
+    elif all(line in current for line in DVB_BLACKLIST_CONTENT.splitlines()):
+        # Nothing changed, so the module dependencies and initramfs are already current.
+        log_info(f"{blacklist_conf} already blacklists the DVB-T modules. Skipping depmod and update-initramfs.")
+        return False
     else:
-        log_info(f"{blacklist_conf} already exists.")
-    run_command(["sudo", "depmod", "-a"])
-    run_command(["sudo", "update-initramfs", "-u"])
+        log_warn(f"{blacklist_conf} exists but is incomplete. Appending the blacklist lines.")
+        _atomic_write(blacklist_conf, current + DVB_BLACKLIST_CONTENT)
+    if refresh_initramfs:
+        _refresh_kernel_modules()
     log_info("Conflicting kernel modules blacklisted. A reboot might be required for this to take effect.")
+    return True
+
+def clone_hfgcspy_app_code(use_git=True):
+    import shutil
 
-def clone_hfgcspy_app_code():
     log_info(f"Cloning HFGCSpy application from GitHub to {HFGCSpy_APP_DIR}.")
+    preserve_dir = f"{HFGCSpy_APP_DIR}.preserve"
+    # A reinstall over an existing Git checkout only fetches what changed, instead of wiping and re-cloning it.
+    update_in_place = use_git and os.path.isdir(HFGCSpy_GIT_DIR)
+    old_config_text = None
     if os.path.exists(HFGCSpy_APP_DIR):
-        log_warn(f"HFGCSpy directory {HFGCSpy_APP_DIR} already exists. Wiping contents for dev install.")
-        shutil.rmtree(HFGCSpy_APP_DIR)
+        if update_in_place:
+            log_info(f"HFGCSpy directory {HFGCSpy_APP_DIR} is already a Git checkout. Updating it in place (keeping config.ini settings).")
+        else:
+            log_warn(f"HFGCSpy directory {HFGCSpy_APP_DIR} already exists. Wiping contents for dev install (keeping config.ini settings).")
+        try:
+            with open(HFGCSpy_CONFIG_FILE, 'r') as f:
+                old_config_text = f.read()
+        except FileNotFoundError:
+            pass
+        # The install state is moved aside as-is; configure_hfgcspy_app compares it with config.ini to skip unchanged configs.
+        os.makedirs(preserve_dir, exist_ok=True)
+        for name in PRESERVED_APP_FILES:
+            if os.path.exists(os.path.join(HFGCSpy_APP_DIR, name)):
+                os.replace(os.path.join(HFGCSpy_APP_DIR, name), os.path.join(preserve_dir, name))
+        if not update_in_place:
+            shutil.rmtree(HFGCSpy_APP_DIR)
     
-    run_command(["git", "clone", HFGCSPY_REPO, HFGCSpy_APP_DIR])
+    if update_in_place:
+        # Same end state as a fresh clone: work tree at the remote tip, untracked leftovers removed.
+        run_command(["git", "-C", HFGCSpy_APP_DIR, "fetch", "--depth=1", "--no-tags", "origin"], stream=True)
+        run_command(["git", "-C", HFGCSpy_APP_DIR, "reset", "--hard", "FETCH_HEAD"])
+        run_command(["git", "-C", HFGCSpy_APP_DIR, "clean", "-ffdxq"])
+    elif use_git:
+        # Only the tip of the default branch is needed; skip downloading the full history and the tags.
+        run_command(["git", "clone", "--depth=1", "--single-branch", "--no-tags", HFGCSPY_REPO, HFGCSpy_APP_DIR], stream=True)
+    else:
+        download_hfgcspy_app_tarball()
+
+    try:
+        with os.scandir(preserve_dir) as entries:
+            for entry in entries:
+                os.replace(entry.path, os.path.join(HFGCSpy_APP_DIR, entry.name))
+        os.rmdir(preserve_dir)
+    except FileNotFoundError:
+        pass # Fresh install: nothing was set aside
+    if old_config_text is not None:
+        _merge_config_values(old_config_text)
     
     log_info(f"Verifying contents of cloned directory: {HFGCSpy_APP_DIR}.")
-    run_command(["ls", "-l", HFGCSpy_APP_DIR], shell=False)
+    with os.scandir(HFGCSpy_APP_DIR) as entries:
+        for entry in sorted(entries, key=lambda e: e.name):
+            _write(f"  {entry.name}/\n" if entry.is_dir(follow_symlinks=False) else f"  {entry.name}\n")
     
     log_info("Python virtual environment and dependencies will be set up inside the Docker image.")
     return True
 
+def _merge_config_values(old_config_text):
+    """
+    Writes the option values of the previous config.ini over the freshly cloned one.
+    Sections and options that only exist upstream keep their new defaults, so a reinstall still picks them up.
+    """
+    import configparser
+    import io
+
+    old_config = configparser.ConfigParser(interpolation=None)
+    old_config.read_string(old_config_text)
+    config_obj = configparser.ConfigParser(interpolation=None)
+    config_obj.read(HFGCSpy_CONFIG_FILE) # Missing file: starts empty and ends up holding just the old values
+    config_obj.read_dict({section: dict(old_config.items(section, raw=True)) for section in old_config.sections()})
+    rendered = io.StringIO()
+    config_obj.write(rendered)
+    _atomic_write(HFGCSpy_CONFIG_FILE, rendered.getvalue())
+    log_info(f"Merged the settings of the previous config.ini into the fresh one from the repository: {HFGCSpy_CONFIG_FILE}")
+
+def download_hfgcspy_app_tarball():
+    """
+    Replaces HFGCSpy_APP_DIR with the GitHub tarball of the default branch (no .git, no history).
+    The tarball is extracted into a fresh directory that is swapped in, so files deleted upstream don't linger
+    (and end up in the image via 'COPY . .'). PRESERVED_APP_FILES are carried over from the old tree.
+    """
+    import shutil
+
+    log_info(f"Downloading HFGCSpy application tarball from {HFGCSPY_TARBALL_URL}.")
+    archive_path = f"{HFGCSpy_APP_DIR}.tar.gz"
+    new_dir = f"{HFGCSpy_APP_DIR}.new"
+    old_dir = f"{HFGCSpy_APP_DIR}.old"
+    run_command(["curl", "-fsSL", "-o", archive_path, HFGCSPY_TARBALL_URL])
+    for leftover in (new_dir, old_dir): # From an interrupted run
+        shutil.rmtree(leftover, ignore_errors=True)
+    os.makedirs(new_dir)
+    run_command(["tar", "xzf", archive_path, "--strip-components=1", "-C", new_dir])
+    os.remove(archive_path)
+
+    for name in PRESERVED_APP_FILES:
+        try:
+            os.replace(os.path.join(HFGCSpy_APP_DIR, name), os.path.join(new_dir, name))
+        except FileNotFoundError:
+            pass
+    try:
+        os.rename(HFGCSpy_APP_DIR, old_dir)
+    except FileNotFoundError:
+        old_dir = None # Fresh install, or clone_hfgcspy_app_code already removed it
+    os.rename(new_dir, HFGCSpy_APP_DIR)
+    if old_dir is not None:
+        shutil.rmtree(old_dir)
+
+def _container_status():
+    """Returns and logs the Docker container's state (e.g. 'running', 'restarting', 'exited')."""
+    # run_command already strips captured output
+    container_status = run_command(["sudo", "docker", "inspect", "-f", '{{.State.Status}}', HFGCSPY_DOCKER_CONTAINER_NAME], capture_output=True)
+    log_info(f"Container '{HFGCSPY_DOCKER_CONTAINER_NAME}' status: {container_status}")
+    return container_status
+
+def _build_docker_image():
+    """
+    Builds the HFGCSpy image from the app dir with BuildKit, which the Dockerfile's cache mounts need.
+    Set explicitly because Debian's docker.io (20.10) still defaults to the legacy builder.
+    No 'sudo' (callers are root), so DOCKER_BUILDKIT isn't dropped by sudo's env_reset.
+    A Git checkout's HEAD is stamped on the image as a label, so --update knows which commit was last built.
+    """
+    label_args = []
+    if os.path.isdir(HFGCSpy_GIT_DIR):
+        revision = run_command(["git", "-C", HFGCSpy_APP_DIR, "rev-parse", "HEAD"], capture_output=True)
+        label_args = ["--label", f"{HFGCSPY_REVISION_LABEL}={revision}"]
+    run_command(["docker", "build", "-t", HFGCSPY_DOCKER_IMAGE_NAME] + label_args + [HFGCSpy_APP_DIR],
+                env={**os.environ, "DOCKER_BUILDKIT": "1"}, stream=True)
+
+def _built_revision():
+    """Returns the Git commit the current image was built from, or '' if there is no image or no label."""
+    return run_command(["sudo", "docker", "image", "inspect", "-f",
+                        f'{{{{index .Config.Labels "{HFGCSPY_REVISION_LABEL}"}}}}', HFGCSPY_DOCKER_IMAGE_NAME],
+                       capture_output=True, check_return=False) or ""
+
 def build_and_run_docker_container():
+    import time
+
     os.system('clear') 
     log_info(f"Building Docker image '{HFGCSPY_DOCKER_IMAGE_NAME}' for HFGCSpy.")
-    current_dir = os.getcwd()
-    os.chdir(HFGCSpy_APP_DIR) 
-    
-    req_path = os.path.join(HFGCSpy_APP_DIR, "requirements.txt")
-    with open(req_path, "a") as f:
-        f.write(f"\n# Build-time unique identifier: {time.time()}\n")
-
-    run_command(["sudo", "docker", "build", "--no-cache", "-t", HFGCSPY_DOCKER_IMAGE_NAME, "."])
-    os.chdir(current_dir) 
+    # Layer cache on: the apt and pip layers are reused while the Dockerfile and requirements.txt are unchanged,
+    # and 'COPY . .' still picks up every code change. The pip/uv cache mounts cover the layers that do rerun.
+    # Pass the app dir as the build context instead of chdir'ing into it
+    _build_docker_image()
 
     log_info(f"Stopping and removing any existing Docker container '{HFGCSPY_DOCKER_CONTAINER_NAME}'.")
     run_command(["sudo", "docker", "stop", HFGCSPY_DOCKER_CONTAINER_NAME], check_return=False)
@@ -429,9 +856,7 @@ def build_and_run_docker_container():
 
     log_info(f"Verifying Docker container '{HFGCSPY_DOCKER_CONTAINER_NAME}' is running.")
     time.sleep(10) 
-    container_status_output = run_command(["sudo", "docker", "inspect", "-f", '{{.State.Status}}', HFGCSPY_DOCKER_CONTAINER_NAME], capture_output=True)
-    container_status = container_status_output.strip()
-    log_info(f"Container '{HFGCSPY_DOCKER_CONTAINER_NAME}' status: {container_status}")
+    container_status = _container_status()
 
     if container_status == "running":
         log_info(f"Docker container '{HFGCSPY_DOCKER_CONTAINER_NAME}' is active and running.")
@@ -442,144 +867,227 @@ def build_and_run_docker_container():
         run_command(["sudo", "docker", "logs", HFGCSPY_DOCKER_CONTAINER_NAME], check_return=False)
 
 
+def _owner_rw_mode(st_mode):
+    """chmod 'u+rwX,go-w' applied to one entry's st_mode."""
+    mode = (stat.S_IMODE(st_mode) | stat.S_IRUSR | stat.S_IWUSR) & ~(stat.S_IWGRP | stat.S_IWOTH)
+    if stat.S_ISDIR(st_mode) or st_mode & (stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH):
+        mode |= stat.S_IXUSR
+    return mode
+
+def _chown_chmod_tree(root, uid, gid, mode):
+    """
+    Sets owner and permissions on root and everything below it in a single in-process os.walk pass.
+    `mode` is a permission int or a function mapping an entry's current st_mode to the new one.
+    Symlinks are neither followed nor chmod'ed.
+    Entries that already have the right owner and mode are left alone, so a re-run costs one lstat per entry.
+    """
+    def apply(path):
+        st = os.lstat(path)
+        if st.st_uid != uid or st.st_gid != gid:
+            os.chown(path, uid, gid, follow_symlinks=False)
+        if not stat.S_ISLNK(st.st_mode):
+            new_mode = mode(st.st_mode) if callable(mode) else mode
+            if stat.S_IMODE(st.st_mode) != new_mode:
+                os.chmod(path, new_mode)
+
+    apply(root)
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in dirnames + filenames:
+            apply(f"{dirpath}/{name}")
+
 def configure_hfgcspy_app():
+    import json
+
     log_info("Configuring HFGCSpy application settings (config.ini on host).")
-    os.makedirs(os.path.dirname(HFGCSpy_CONFIG_FILE), exist_ok=True) 
-    
-    if not os.path.exists(HFGCSpy_CONFIG_FILE):
-        template_path = os.path.join(HFGCSpy_APP_DIR, "config.ini.template")
-        if os.path.exists(template_path):
-            log_info(f"Copying {os.path.basename(template_path)} to {os.path.basename(HFGCSpy_CONFIG_FILE)}.")
-            shutil.copyfile(template_path, HFGCSpy_CONFIG_FILE)
-        else:
-            log_error(f"config.ini.template not found in {HFGCSpy_APP_DIR}. Cannot proceed with app configuration.")
-    else:
+    # One stat answers "is there a config.ini?" and supplies the mtime for the fast path below.
+    # Without one, the template is parsed directly and the result written as config.ini, so there is no copy step.
+    # No makedirs: config.ini lives next to its template, so a missing app dir fails the template read anyway.
+    try:
+        config_mtime_ns = os.stat(HFGCSpy_CONFIG_FILE).st_mtime_ns
+        source_path = HFGCSpy_CONFIG_FILE
         log_info("Existing config.ini found. Using existing configuration. Please verify it points to correct paths.")
+    except FileNotFoundError:
+        config_mtime_ns = None
+        source_path = HFGCSpy_CONFIG_TEMPLATE_FILE
+        log_info(f"No config.ini yet. Creating it from {os.path.basename(HFGCSpy_CONFIG_TEMPLATE_FILE)}.")
+
+    # Values the installer owns in config.ini; everything else in the file is left as the user set it.
+    desired_values = {
+        'app': {
+            'mode': 'standalone',
+            'database_path': "/app/data/hfgcspy.db",
+            'internal_port': str(HFGCSPY_INTERNAL_PORT),
+        },
+        'app_paths': {
+            'status_file': HFGCSPY_STATUS_JSON_PATH,
+            'messages_file': HFGCSPY_MESSAGES_JSON_PATH,
+            'recordings_dir': HFGCSPY_RECORDINGS_PATH,
+            'config_json_file': HFGCSPY_CONFIG_JSON_PATH,
+        },
+        'logging': {
+            'log_file': "/app/logs/hfgcspy.log",
+        },
+    }
+
+    # Fast path: config.ini is untouched since we last wrote these exact values, so skip the ConfigParser round-trip.
+    try:
+        with open(HFGCSpy_INSTALL_STATE_FILE, 'r') as f:
+            install_state = json.load(f)
+        state_matches = (config_mtime_ns is not None
+                         and install_state.get('config_mtime_ns') == config_mtime_ns
+                         and install_state.get('values') == desired_values)
+    except (OSError, ValueError):
+        state_matches = False
+
+    if state_matches:
+        log_info(f"config.ini unchanged since the last install, skipping rewrite: {HFGCSpy_CONFIG_FILE}")
+    else:
+        import configparser
+        import io
 
-    config_obj = configparser.ConfigParser()
-    config_obj.read(HFGCSpy_CONFIG_FILE)
-
-    if not config_obj.has_section('app_paths'):
-        config_obj.add_section('app_paths')
-    if not config_obj.has_section('app'):
-        config_obj.add_section('app')
+        # The text is read once and used both for parsing and for the unchanged-content check below
+        try:
+            with open(source_path, 'r') as f:
+                current_text = f.read()
+        except FileNotFoundError:
+            log_error(f"config.ini.template not found in {HFGCSpy_APP_DIR}. Cannot proceed with app configuration.")
+        config_obj = configparser.ConfigParser()
+        config_obj.read_string(current_text, source=source_path)
 
-    config_obj.set('app', 'mode', str('standalone'))
-    config_obj.set('app', 'database_path', str("/app/data/hfgcspy.db"))
-    config_obj.set('app', 'internal_port', str(HFGCSPY_INTERNAL_PORT)) 
-    
-    config_obj.set('app_paths', 'status_file', str(os.path.join(HFGCSpy_DATA_DIR, "status.json")))
-    config_obj.set('app_paths', 'messages_file', str(os.path.join(HFGCSpy_DATA_DIR, "messages.json")))
-    config_obj.set('app_paths', 'recordings_dir', str(HFGCSPY_RECORDINGS_PATH))
-    config_obj.set('app_paths', 'config_json_file', str(os.path.join(HFGCSpy_DATA_DIR, "config.json")))
+        # read_dict adds missing sections and overwrites our options in one pass, no has_section() probes
+        config_obj.read_dict(desired_values)
 
-    if not config_obj.has_section('logging'):
-        config_obj.add_section('logging')
-    config_obj.set('logging', 'log_file', str("/app/logs/hfgcspy.log"))
+        rendered = io.StringIO()
+        config_obj.write(rendered)
+        rendered = rendered.getvalue()
+        if config_mtime_ns is not None and current_text == rendered:
+            log_info(f"config.ini already up to date: {HFGCSpy_CONFIG_FILE}")
+        else:
+            _atomic_write(HFGCSpy_CONFIG_FILE, rendered)
+            log_info(f"Paths in config.ini updated: {HFGCSpy_CONFIG_FILE}")
 
-    with open(HFGCSpy_CONFIG_FILE, 'w') as f:
-        config_obj.write(f)
-    log_info(f"Paths in config.ini updated: {HFGCSpy_CONFIG_FILE}")
+        install_state = {'config_mtime_ns': os.stat(HFGCSpy_CONFIG_FILE).st_mtime_ns, 'values': desired_values}
+        _atomic_write(HFGCSpy_INSTALL_STATE_FILE, json.dumps(install_state, indent=4))
 
-    hfgcs_user = os.getenv("SUDO_USER") or os.getlogin() 
+    hfgcs_user = _invoking_user()
     log_info(f"Setting ownership of {HFGCSpy_APP_DIR} to {hfgcs_user}.")
-    run_command(["sudo", "chown", "-R", f"{hfgcs_user}:{hfgcs_user}", HFGCSpy_APP_DIR])
-    run_command(["sudo", "chmod", "-R", "u+rwX,go-w", HFGCSpy_APP_DIR]) 
+    # The user's primary group from the same passwd entry; no separate group-database lookup
+    _chown_chmod_tree(HFGCSpy_APP_DIR, *_uid_gid(hfgcs_user), _owner_rw_mode)
 
     log_info(f"Creating web-accessible data directories on host: {HFGCSpy_DATA_DIR} and {HFGCSPY_RECORDINGS_PATH}.")
-    os.makedirs(HFGCSpy_DATA_DIR, exist_ok=True)
-    os.makedirs(HFGCSPY_RECORDINGS_PATH, exist_ok=True)
-    run_command(["sudo", "chown", "-R", "www-data:www-data", HFGCSpy_DATA_DIR])
-    run_command(["sudo", "chmod", "-R", "775", HFGCSpy_DATA_DIR])
+    os.makedirs(HFGCSPY_RECORDINGS_PATH, exist_ok=True) # Creates HFGCSpy_DATA_DIR on the way
+    _chown_chmod_tree(HFGCSpy_DATA_DIR, *_uid_gid("www-data"), 0o775)
 
     log_info("HFGCSpy application configured.")
 
 def setup_systemd_service():
     log_info("Setting up HFGCSpy as a systemd service.")
     
-    hfgcs_user = os.getenv("SUDO_USER")
-    if not hfgcs_user:
+    hfgcs_user = _invoking_user()
+    if not os.getenv("SUDO_USER"):
         log_warn(f"SUDO_USER environment variable not set. Defaulting HFGCSpy service user to '{hfgcs_user}'. Please confirm this is correct or manually adjust.")
 
     service_file_path = f"/etc/systemd/system/{HFGCSPY_SERVICE_NAME}"
-    service_content = f"""
-[Unit]
-Description=HFGCSpy SDR Scanner and Parser (Docker Container)
-After=network.target docker.service
-Requires=docker.service
-
-[Service]
-ExecStart=/usr/bin/docker start -a {HFGCSPY_DOCKER_CONTAINER_NAME}
-ExecStop=/usr/bin/docker stop {HFGCSPY_DOCKER_CONTAINER_NAME}
-ExecReload=/usr/bin/docker restart {HFGCSPY_DOCKER_CONTAINER_NAME}
-Restart=always
-User={hfgcs_user} # User to run docker commands (must be in docker group)
-
-[Install]
-WantedBy=multi-user.target
-"""
-    with open(service_file_path, "w") as f:
-        f.write(service_content)
-    
-    run_command(["sudo", "systemctl", "daemon-reload"])
+    service_content = _SERVICE_UNIT_TEMPLATE.format_map({'container_name': HFGCSPY_DOCKER_CONTAINER_NAME, 'user': hfgcs_user})
+    # On a re-run the unit is usually identical; then there is nothing to write and no daemon-reload to run.
+    try:
+        with open(service_file_path, "r") as f:
+            unit_unchanged = f.read() == service_content
+    except FileNotFoundError:
+        unit_unchanged = False
+    if unit_unchanged:
+        log_info(f"{service_file_path} already up to date.")
+    else:
+        _atomic_write(service_file_path, service_content)
+        run_command(["sudo", "systemctl", "daemon-reload"])
     
     if ask_yes_no("Do you want HFGCSpy Docker container to start automatically at machine boot?", default_yes=True):
-        run_command(["sudo", "systemctl", "enable", HFGCSPY_SERVICE_NAME])
+        # 'enable --now' enables and starts in a single systemctl call
+        run_command(["sudo", "systemctl", "enable", "--now", HFGCSPY_SERVICE_NAME])
         log_info("HFGCSpy Docker service enabled to start automatically at boot.")
     else:
         run_command(["sudo", "systemctl", "disable", HFGCSPY_SERVICE_NAME])
         log_info(f"HFGCSpy Docker service will NOT start automatically at boot. You'll need to start it manually: sudo systemctl start {HFGCSPY_SERVICE_NAME}")
-
-    run_command(["sudo", "systemctl", "start", HFGCSPY_SERVICE_NAME])
+        run_command(["sudo", "systemctl", "start", HFGCSPY_SERVICE_NAME])
     log_info("HFGCSpy Docker service setup and started.")
 
 def update_hfgcspy_app_code():
-    log_info("Stopping HFGCSpy Docker container for update.")
-    run_command(["sudo", "systemctl", "stop", HFGCSPY_SERVICE_NAME], check_return=False)
-    
     if not os.path.exists(HFGCSpy_APP_DIR):
         log_error(f"HFGCSpy application directory {HFGCSpy_APP_DIR} not found. Please run --install first.")
-    
-    log_info(f"Pulling latest changes from {HFGCSPY_REPO} in {HFGCSpy_APP_DIR}.")
-    current_dir = os.getcwd() 
-    os.chdir(HFGCSpy_APP_DIR) 
-    run_command(["git", "pull"])
-    os.chdir(current_dir) 
+
+    use_git = os.path.isdir(HFGCSpy_GIT_DIR)
+    if use_git:
+        log_info(f"Fetching latest changes from {HFGCSPY_REPO} in {HFGCSpy_APP_DIR}.")
+        # Fetch only the tip commit (no tags) so the shallow clone stays shallow.
+        # 'git -C' runs git in the app dir without changing this process's working directory.
+        run_command(["git", "-C", HFGCSpy_APP_DIR, "fetch", "--depth=1", "--no-tags", "origin"])
+        fetched_head = run_command(["git", "-C", HFGCSpy_APP_DIR, "rev-parse", "FETCH_HEAD"], capture_output=True)
+        # Compared with the commit the image was built from, not the checkout's HEAD: the reset below runs before
+        # the build, so after a failed build HEAD already equals FETCH_HEAD and a retry must not stop here.
+        if _built_revision() == fetched_head:
+            # Nothing new upstream: leave the running container alone instead of stopping, rebuilding and restarting it.
+            log_info(f"HFGCSpy is already up to date ({fetched_head[:12]}). Nothing to do.")
+            return
+
+    # The service keeps running while the code is refreshed and the image rebuilt; a single restart at the end
+    # replaces the stop-before/start-after pair. The container's config.ini bind mount still points at the old
+    # file, which git and tar replace rather than rewrite in place.
+    # config.ini is tracked in the repo but edited locally, so keep it across the refresh.
+    # Its owner and mode (set by configure_hfgcspy_app so the user can edit it) are restored with it.
+    local_config = None
+    if os.path.exists(HFGCSpy_CONFIG_FILE):
+        config_stat = os.stat(HFGCSpy_CONFIG_FILE)
+        with open(HFGCSpy_CONFIG_FILE, 'rb') as f:
+            local_config = f.read()
+
+    if use_git:
+        run_command(["git", "-C", HFGCSpy_APP_DIR, "reset", "--hard", "FETCH_HEAD"])
+    else:
+        log_info(f"{HFGCSpy_APP_DIR} was installed from a tarball. Downloading the latest one.")
+        download_hfgcspy_app_tarball()
+
+    if local_config is not None:
+        _atomic_write(HFGCSpy_CONFIG_FILE, local_config, mode=stat.S_IMODE(config_stat.st_mode),
+                      uid=config_stat.st_uid, gid=config_stat.st_gid)
     
     log_info(f"Rebuilding Docker image '{HFGCSPY_DOCKER_IMAGE_NAME}' with latest code.")
-    run_command(["sudo", "docker", "build", "-t", HFGCSPY_DOCKER_IMAGE_NAME, HFGCSPY_APP_DIR])
+    _build_docker_image()
 
     log_info(f"Restarting HFGCSpy Docker service {HFGCSPY_SERVICE_NAME}.")
-    run_command(["sudo", "systemctl", "start", HFGCSPY_SERVICE_NAME])
-    log_info("HFGCSpy updated and restarted.")
+    # --no-block: queue the restart job and return; 'setup.py --status' reports when it is active
+    run_command(["sudo", "systemctl", "restart", "--no-block", HFGCSPY_SERVICE_NAME])
+    log_info("HFGCSpy updated; the service is restarting.")
 
 def check_sdr():
+    import shutil
+
     log_info("Checking for RTL-SDR dongle presence on host system.")
-    try:
-        run_command(["which", "rtl_test"], check_return=True, capture_output=True)
-        log_info("rtl_test command found. Running test.")
-        result = run_command(["timeout", "5s", "rtl_test", "-t", "-s", "1M", "-d", "0", "-r"], capture_output=True, text=True, check_return=False)
-        
-        if "Found" in result.stdout:
-            log_info("RTL-SDR dongle detected and appears to be working.")
-        else:
-            log_warn("No RTL-SDR dongle detected or it's not working correctly.")
-            log_warn("Ensure your RTL-SDR is plugged in and the blacklisting of DVB-T modules has taken effect (may require reboot).")
-        log_info("Full rtl_test output:\n" + result.stdout + result.stderr)
-    except subprocess.CalledProcessError as e:
-        log_warn(f"rtl_test command failed: {e.stderr}. Please ensure rtl-sdr tools are properly installed.")
-    except FileNotFoundError:
+    if shutil.which("rtl_test") is None:
         log_warn("rtl_test not found. It should have been installed. Please ensure build-essential and rtl-sdr packages are installed.")
-    except Exception as e:
-        log_error(f"An unexpected error occurred during SDR check: {e}")
+        return
+    log_info("rtl_test command found. Running test.")
+    # Not captured: run_command prints rtl_test's output and returns the CompletedProcess.
+    # rtl_test reports "Found N device(s)" on stderr, so both streams are checked.
+    result = run_command(["rtl_test", "-t", "-s", "1M", "-d", "0", "-r"], check_return=False, timeout=5)
+    
+    if "Found" in result.stdout or "Found" in result.stderr:
+        log_info("RTL-SDR dongle detected and appears to be working.")
+    else:
+        log_warn("No RTL-SDR dongle detected or it's not working correctly.")
+        log_warn("Ensure your RTL-SDR is plugged in and the blacklisting of DVB-T modules has taken effect (may require reboot).")
 
 
 def uninstall_hfgcspy():
+    import shutil
+
     log_warn(f"Stopping and disabling HFGCSpy Docker service {HFGCSPY_SERVICE_NAME}.")
-    run_command(["sudo", "systemctl", "stop", HFGCSPY_SERVICE_NAME], check_return=False)
-    run_command(["sudo", "systemctl", "disable", HFGCSPY_SERVICE_NAME], check_return=False)
-    if os.path.exists(f"/etc/systemd/system/{HFGCSPY_SERVICE_NAME}"):
+    # 'disable --now' stops and disables in a single systemctl call
+    run_command(["sudo", "systemctl", "disable", "--now", HFGCSPY_SERVICE_NAME], check_return=False)
+    # Just try the removals: one syscall each, instead of an exists() check followed by the real call
+    try:
         os.remove(f"/etc/systemd/system/{HFGCSPY_SERVICE_NAME}")
+    except FileNotFoundError:
+        pass
     run_command(["sudo", "systemctl", "daemon-reload"])
     
     log_warn(f"Stopping and removing Docker container '{HFGCSPY_DOCKER_CONTAINER_NAME}'.")
@@ -590,9 +1098,9 @@ def uninstall_hfgcspy():
     run_command(["sudo", "docker", "volume", "rm", DOCKER_VOLUME_NAME], check_return=False)
 
     log_warn(f"Removing HFGCSpy application directory: {HFGCSpy_APP_DIR}.")
-    if os.path.exists(HFGCSpy_APP_DIR):
+    try:
         shutil.rmtree(HFGCSpy_APP_DIR)
-    else:
+    except FileNotFoundError:
         log_warn(f"HFGCSpy application directory {HFGCSpy_APP_DIR} not found. Skipping removal.")
     
     log_info("HFGCSpy uninstallation complete.")
@@ -605,104 +1113,201 @@ def stop_hfgcspy():
 
 def status_hfgcspy():
     log_info("Checking HFGCSpy Docker service status.")
-    run_command(["sudo", "systemctl", "status", HFGCSPY_SERVICE_NAME], shell=True)
+    # 'systemctl show' exits 0 whatever the unit's state, so branch on the value instead of the exit code.
+    state = run_command(["systemctl", "show", "-p", "ActiveState", "--value", HFGCSPY_SERVICE_NAME],
+                        capture_output=True, check_return=False)
+    if state == "active":
+        log_success(f"{HFGCSPY_SERVICE_NAME} is active.")
+    else:
+        log_warn(f"{HFGCSPY_SERVICE_NAME} is {state or 'unknown'}. Use 'journalctl -u {HFGCSPY_SERVICE_NAME}' for details.")
 
 
 # --- Main Script Logic ---
 
-def main():
-    log_info(f"HFGCSpy Installer (Version: {__version__})")
-
-    parser = argparse.ArgumentParser(description=f"HFGCSpy Installer (Version: {__version__})")
-    parser.add_argument('--install', action='store_true', help="Install HFGCSpy application and configure services.")
-    parser.add_argument('--run', action='store_true', help="Run HFGCSpy main application directly (for debugging).")
-    parser.add_argument('--stop', action='store_true', help="Stop HFGCSpy service.")
-    parser.add_argument('--status', action='store_true', help="Check HFGCSpy and Apache2 service status.")
-    parser.add_argument('--uninstall', action='store_true', help="Uninstall HFGCSpy application and associated files.")
-    parser.add_argument('--update', action='store_true', help="Update HFGCSpy application code from Git and restart service.")
-    parser.add_argument('--check_sdr', action='store_true', help="Check for RTL-SDR dongle presence.")
+def _do_install():
+    import concurrent.futures
+    import shutil
+
+    check_root()
+    # Docker comes from its own apt repo; register it first so its packages join the single apt transaction below.
+    docker_packages = setup_docker_apt_repo()
+    # Re-running --install on a provisioned host skips the apt update, download and install here.
+    apt_packages = _missing_apt_packages(APT_PACKAGES + docker_packages)
+    if not apt_packages:
+        log_info("All system packages are already installed; skipping apt.")
+
+    # Ask up front: the clone below runs on a worker thread and must not prompt.
+    use_git = ask_yes_no("Keep a Git checkout so 'setup.py --update' can fetch future changes?", default_yes=True)
+    # git itself comes from APT_PACKAGES, so a git clone on a host without it has to wait for the install.
+    clone_needs_apt = use_git and shutil.which("git") is None
+    if clone_needs_apt:
+        install_system_dependencies(apt_packages)
+    # The clone and the apt package download are separate network streams and the module blacklisting
+    # (depmod/update-initramfs) is local disk/CPU work. None depends on the others, so overlap them.
+    with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
+        # Each task's output is held back and printed as one block when it finishes, instead of interleaving line by line.
+        # The blacklist is only written here; its initramfs rebuild waits until apt is done (see below).
+        blacklist_future = executor.submit(_buffered_output, blacklist_dvb_modules, False)
+        futures = [blacklist_future, executor.submit(_buffered_output, clone_hfgcspy_app_code, use_git)]
+        if apt_packages and not clone_needs_apt:
+            futures.append(executor.submit(_buffered_output, download_system_dependencies, apt_packages))
+        for future in futures:
+            future.result() # Re-raises SystemExit from log_error() in the worker
+    if apt_packages and not clone_needs_apt:
+        install_system_dependencies(apt_packages, update_lists=False) # Installs from the .debs downloaded above
+    if blacklist_future.result():
+        # Once, after every apt transaction, so the new initramfs also covers anything the packages changed
+        _refresh_kernel_modules()
+    if docker_packages:
+        add_user_to_docker_group() # The 'docker' group only exists once docker-ce is installed
+    configure_hfgcspy_app()
+    
+    log_section("SDR Host-Level Diagnosis and Fix")
+    sdr_fixed = diagnose_and_fix_sdr_host()
+    if not sdr_fixed:
+        log_error("SDR could not be fixed on the host system. Please resolve this manually before proceeding with HFGCSpy installation.")
+
+    build_and_run_docker_container()
+    setup_systemd_service()
+    log_info("HFGCSpy installation complete. Please consider rebooting your Raspberry Pi for full effect.")
+
+    log_info("\n--- HFGCSpy Access Information ---")
+    log_info(f"Web UI (via Docker directly): http://127.0.0.1:{HFGCSPY_INTERNAL_PORT}/")
+    log_info(f"Docker API (local only for debugging): http://127.0.0.1:{HFGCSPY_INTERNAL_PORT}/hfgcspy-api/status")
     
-    args = parser.parse_args()
+    log_info("\n--- Post-Installation Diagnostic Report ---")
+    log_info(f"Verifying Docker container '{HFGCSPY_DOCKER_CONTAINER_NAME}' status...")
+    _container_status()
 
-    _set_global_paths_runtime(APP_DIR_DEFAULT, WEB_ROOT_DIR_DEFAULT) 
+    log_info("\nShowing active Docker containers ('docker ps'):")
+    run_command(["sudo", "docker", "ps"], check_return=False)
 
-    if not args.install:
-        _load_paths_from_config() 
+    log_info(f"\nShowing Docker container stats for '{HFGCSPY_DOCKER_IMAGE_NAME}' ('docker stats --no-stream'):")
+    run_command(["sudo", "docker", "stats", HFGCSPY_DOCKER_IMAGE_NAME, "--no-stream"], check_return=False) # Changed from CONTAINER_NAME to IMAGE_NAME
 
-    if len(sys.argv) == 1:
-        parser.print_help()
-        sys.exit(0)
+    log_info(f"\nChecking that port {HFGCSPY_INTERNAL_PORT} is listening on 127.0.0.1:")
+    if _port_is_listening("127.0.0.1", int(HFGCSPY_INTERNAL_PORT)):
+        log_info(f"Port {HFGCSPY_INTERNAL_PORT} is accepting connections.")
+    else:
+        log_warn(f"Nothing is accepting connections on 127.0.0.1:{HFGCSPY_INTERNAL_PORT}.")
 
-    if args.install:
-        check_root()
-        install_docker()
-        install_system_dependencies()
-        clone_hfgcspy_app_code()
-        configure_hfgcspy_app()
-        
-        log_section("SDR Host-Level Diagnosis and Fix")
-        sdr_fixed = diagnose_and_fix_sdr_host()
-        if not sdr_fixed:
-            log_error("SDR could not be fixed on the host system. Please resolve this manually before proceeding with HFGCSpy installation.")
-
-        build_and_run_docker_container()
-        setup_systemd_service()
-        log_info("HFGCSpy installation complete. Please consider rebooting your Raspberry Pi for full effect.")
-
-        log_info("\n--- HFGCSpy Access Information ---")
-        log_info(f"Web UI (via Docker directly): http://127.0.0.1:{HFGCSPY_INTERNAL_PORT}/")
-        log_info(f"Docker API (local only for debugging): http://127.0.0.1:{HFGCSPY_INTERNAL_PORT}/hfgcspy-api/status")
-        
-        log_info("\n--- Post-Installation Diagnostic Report ---")
-        log_info(f"Verifying Docker container '{HFGCSPY_DOCKER_CONTAINER_NAME}' status...")
-        container_status_output = run_command(["sudo", "docker", "inspect", "-f", '{{.State.Status}}', HFGCSPY_DOCKER_CONTAINER_NAME], capture_output=True)
-        container_status = container_status_output.strip()
-        log_info(f"Container '{HFGCSPY_DOCKER_CONTAINER_NAME}' status: {container_status}")
+    log_info(f"\nRequesting Web UI root (http://127.0.0.1:{HFGCSPY_INTERNAL_PORT}/):")
+    _print_http_response(f"http://127.0.0.1:{HFGCSPY_INTERNAL_PORT}/")
 
-        log_info("\nShowing active Docker containers ('docker ps'):")
-        run_command(["sudo", "docker", "ps"], check_return=False)
+    log_info(f"\nRequesting API status (http://127.0.0.1:{HFGCSPY_INTERNAL_PORT}/hfgcspy-api/status):")
+    _print_http_response(f"http://127.0.0.1:{HFGCSPY_INTERNAL_PORT}/hfgcspy-api/status")
+    
+    log_info("\n--- Docker Application Logs (last 50 lines) ---")
+    run_command(["sudo", "docker", "logs", "--tail", "50", HFGCSPY_DOCKER_CONTAINER_NAME], check_return=False)
+    log_info("--- End Docker Application Logs ---")
+
+    log_info("\n**IMPORTANT:** Please review the 'Post-Installation Diagnostic Report' above carefully.")
+    log_info("If the container status is 'restarting' or 'exited', the application has failed to start.")
+    log_info("The detailed application logs are displayed above this message. This is the key to debugging.")
+    log_info("----------------------------------")
+
+def _do_run():
+    check_root()
+    log_info(f"Attempting to run HFGCSpy Docker container '{HFGCSPY_DOCKER_CONTAINER_NAME}' directly.")
+    log_info(f"To manage as a service, use 'sudo systemctl start {HFGCSPY_SERVICE_NAME}'.")
+    command = ["sudo", "docker", "start", "-a", HFGCSPY_DOCKER_CONTAINER_NAME]
+    log_info("Executing: %s", ' '.join(command))
+    # docker attaches for as long as the container runs; exec it in place of this interpreter rather than
+    # keeping setup.py resident as its parent. Ctrl-C and the exit status then go straight to docker.
+    sys.stdout.flush()
+    try:
+        os.execvp(command[0], command)
+    except OSError as e:
+        log_error("Could not execute %s: %s", command[0], e)
+
+def _do_stop():
+    check_root()
+    stop_hfgcspy()
+
+def _do_uninstall():
+    check_root()
+    uninstall_hfgcspy()
+
+def _do_update():
+    check_root()
+    update_hfgcspy_app_code()
+
+# CLI commands: (flag, handler, whether it needs the installed paths from config.ini, help text).
+# Only commands that touch the app or data directories read config.ini; the rest work from service and container names.
+# main() builds the parser from this table and dispatches on the selected row.
+_ACTIONS = (
+    ('--install', _do_install, False, "Install HFGCSpy application and configure services."),
+    ('--run', _do_run, False, "Run HFGCSpy main application directly (for debugging)."),
+    ('--stop', _do_stop, False, "Stop HFGCSpy service."),
+    ('--status', status_hfgcspy, False, "Check HFGCSpy and Apache2 service status."),
+    ('--uninstall', _do_uninstall, True, "Uninstall HFGCSpy application and associated files."),
+    ('--update', _do_update, True, "Update HFGCSpy application code from Git and restart service."),
+    ('--check_sdr', check_sdr, False, "Check for RTL-SDR dongle presence."),
+)
+
+# Flag -> (handler, uses_installed_paths), for the single-flag fast path in main()
+_ACTIONS_BY_FLAG = {flag: (handler, uses_installed_paths) for flag, handler, uses_installed_paths, _ in _ACTIONS}
+
+def _help_text():
+    """
+    The --help text, laid out like argparse's but built straight from _ACTIONS,
+    so printing help needs neither argparse nor its gettext/textwrap imports.
+    """
+    prog = os.path.basename(sys.argv[0])
+    width = max(len(flag) for flag, *_ in _ACTIONS) + 2
+    lines = [
+        f"usage: {prog} [-h] [{' | '.join(flag for flag, *_ in _ACTIONS)}]",
+        "",
+        f"HFGCSpy Installer (Version: {__version__})",
+        "",
+        "options:",
+        f"  {'-h, --help':<{width}}show this help message and exit",
+    ]
+    lines.extend(f"  {flag:<{width}}{help_text}" for flag, _, _, help_text in _ACTIONS)
+    return "\n".join(lines) + "\n"
+
+def _build_parser():
+    """Builds the CLI parser from _ACTIONS. argparse (and the gettext/textwrap it pulls in) is imported only here."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description=f"HFGCSpy Installer (Version: {__version__})")
+    # Each flag stores its (handler, needs installed paths) pair in args.action, so dispatch is a single call.
+    actions = parser.add_mutually_exclusive_group()
+    for flag, handler, uses_installed_paths, help_text in _ACTIONS:
+        actions.add_argument(flag, dest='action', action='store_const', const=(handler, uses_installed_paths), help=help_text)
+    parser.set_defaults(action=None)
+    return parser
 
-        log_info(f"\nShowing Docker container stats for '{HFGCSPY_DOCKER_IMAGE_NAME}' ('docker stats --no-stream'):")
-        run_command(["sudo", "docker", "stats", HFGCSPY_DOCKER_IMAGE_NAME, "--no-stream"], check_return=False) # Changed from CONTAINER_NAME to IMAGE_NAME
+def main():
+    # Flush at each newline so log lines stay in order with the output of the commands we run, even when piped to a file
+    sys.stdout.reconfigure(line_buffering=True)
 
-        log_info(f"\nShowing listening ports on host ('sudo netstat -tulnp | grep {HFGCSPY_INTERNAL_PORT}'):")
-        run_command(["sudo", "netstat", "-tulnp", "|", "grep", str(HFGCSPY_INTERNAL_PORT)], shell=True, check_return=False)
+    # Help, or no command at all: print usage straight away, before the banner and any path work
+    if len(sys.argv) == 1 or sys.argv[1] in ('-h', '--help'):
+        sys.stdout.write(_help_text())
+        sys.exit(0)
 
-        log_info(f"\nAttempting curl to Web UI root (http://127.0.0.1:{HFGCSPY_INTERNAL_PORT}/):")
-        run_command(["curl", f"http://127.0.0.1:{HFGCSPY_INTERNAL_PORT}/"], check_return=False)
+    # The usual call is exactly one command flag: look it up directly and skip building the argparse parser.
+    # Anything else (typos, several flags, '--') goes through argparse for its usage errors.
+    action = _ACTIONS_BY_FLAG.get(sys.argv[1]) if len(sys.argv) == 2 else None
+    if action is None:
+        parser = _build_parser()
+        action = parser.parse_args().action
+        # No command among the arguments: print help before doing any path detection
+        if action is None:
+            parser.print_help()
+            sys.exit(0)
 
-        log_info(f"\nAttempting curl to API status (http://127.0.0.1:{HFGCSPY_INTERNAL_PORT}/hfgcspy-api/status):")
-        run_command(["curl", f"http://127.0.0.1:{HFGCSPY_INTERNAL_PORT}/hfgcspy-api/status"], check_return=False)
-        
-        log_info("\n--- Docker Application Logs (last 50 lines) ---")
-        run_command(["sudo", "docker", "logs", "--tail", "50", HFGCSPY_DOCKER_CONTAINER_NAME], check_return=False)
-        log_info("--- End Docker Application Logs ---")
-
-        log_info("\n**IMPORTANT:** Please review the 'Post-Installation Diagnostic Report' above carefully.")
-        log_info("If the container status is 'restarting' or 'exited', the application has failed to start.")
-        log_info("The detailed application logs are displayed above this message. This is the key to debugging.")
-        log_info("----------------------------------")
-
-    elif args.run:
-        check_root()
-        log_info(f"Attempting to run HFGCSpy Docker container '{HFGCSPY_DOCKER_CONTAINER_NAME}' directly.")
-        log_info(f"To manage as a service, use 'sudo systemctl start {HFGCSPY_SERVICE_NAME}'.")
-        run_command(["sudo", "docker", "start", "-a", HFGCSPY_DOCKER_CONTAINER_NAME])
-    elif args.stop:
-        check_root()
-        stop_hfgcspy()
-    elif args.status:
-        status_hfgcspy()
-    elif args.uninstall:
-        check_root()
-        uninstall_hfgcspy()
-    elif args.update:
-        check_root()
-        update_hfgcspy_app_code()
-    elif args.check_sdr:
-        check_sdr()
+    log_info(f"HFGCSpy Installer (Version: {__version__})")
+    handler, uses_installed_paths = action
+
+    # Set the globals once, from whichever pair of paths this action runs against
+    if uses_installed_paths:
+        _set_global_paths_runtime(*_detect_installed_paths())
     else:
-        parser.print_help()
+        _set_global_paths_runtime(APP_DIR_DEFAULT, WEB_ROOT_DIR_DEFAULT)
+
+    handler()
 
 if __name__ == "__main__":
     main()